@@ -1,20 +1,19 @@
-import asyncio
-import socket
 import threading
 import time
-import queue
 
-from concurrent.futures import ThreadPoolExecutor
 from typing import Callable
 from pynput import mouse, keyboard
-from scrcpy_client import key_scancode_map
+from scrcpy_client import get_key_scancode_map
 from scrcpy_client.android_def import AKeyCode, AKeyEventAction
 from scrcpy_client.hid_def import HID_KEYBOARD_MAX_KEYS, HID_MouseButton, HIDKeymod, KeymodStateStore, MouseButtonStateStore
 from scrcpy_client.hid_event import HIDKeyboardInitEvent, KeyEmptyEvent, KeyEvent, MouseClickEvent, MouseMoveEvent, MouseScrollEvent, HIDMouseInitEvent
-from scrcpy_client.inject_event import InjectKeyCode
+from scrcpy_client.inject_event import WAKEUP_KEY_EVENTS, InjectKeyCode
 from scrcpy_client.sdl_def import SDL_Scancode
+from server.scrcpy_sender import ControlSender
 from input.edge_portal import edge_portal_passing_event
+from input.mouse_motion import DEFAULT_REPORT_RATE, JitterStats, MotionAccumulator, RateMeter, ReportScheduler, output_report_rate
 from utils.config_manager import get_config
+from utils.logger import LOGGER, LogType
 
 CallbackResult = Exception | None
 SendDataCallback = Callable[[bytes], CallbackResult]
@@ -50,7 +49,7 @@ def _customized_shortcuts(
             ]
     return None
 
-def _compute_mouse_pointer_diff(cur_x: int, cur_y: int, last_x: int, last_y: int) -> tuple[int, int]:
+def _compute_mouse_pointer_diff(cur_x: int, cur_y: int, last_x: int, last_y: int) -> tuple[float, float]:
     diff_x = cur_x - last_x
     diff_y = cur_y - last_y
     speed = (diff_x ** 2 + diff_y ** 2) ** 0.5
@@ -58,35 +57,33 @@ def _compute_mouse_pointer_diff(cur_x: int, cur_y: int, last_x: int, last_y: int
     # check speed to prevent divide-by-zero error
     min_scale = max(1, speed_factor / 2.5)
     adjusted_scale = 1 if speed == 0 else min(min_scale, speed_factor / (speed ** 0.6))
-    diff_x = int(diff_x * adjusted_scale)
-    diff_y = int(diff_y * adjusted_scale)
-    return diff_x, diff_y
+    # the sub-pixel parts are kept by the `MotionAccumulator`
+    return diff_x * adjusted_scale, diff_y * adjusted_scale
 
 def callback_context_wrapper(
-    client_socket: socket.socket,
+    sender: ControlSender,
 ) -> tuple[
-    SendDataCallback, SendDataAsyncCallback,
+    SendDataCallback, SendDataAsyncCallback, SendDataAsyncCallback,
     KeyEventCallback, KeyEventCallback,
     MouseMoveCallback, MouseClickCallback, MouseScrollCallback,
 ]:
     from input.controller import schedule_exit
 
-    executor = ThreadPoolExecutor()
+    # send errors are reported to `schedule_exit` only once, by the sender itself
+    sender.start(on_error=schedule_exit)
     def send_data(data: bytes) -> CallbackResult:
-        nonlocal client_socket, wakeup_counter
+        nonlocal wakeup_counter
         wakeup_counter = 0
-        try: client_socket.sendall(data)
-        except Exception as e: return e
-        return None
-    
+        return sender.send(data)
+
     def send_data_async(data: bytes):
-        async def _async(data: bytes):
-            res = await asyncio\
-                .get_running_loop()\
-                .run_in_executor(executor, send_data, data)
-            if res is not None: schedule_exit(res)
-        asyncio.run(_async(data))
+        send_data(data)
+
+    def send_data_bulk(data: bytes):
+        # for the large payloads (clipboard), they are written behind the input events
+        sender.send_bulk(data)
 
+    key_scancode_map = get_key_scancode_map()
     keyboard_init = HIDKeyboardInitEvent()
     send_data(keyboard_init.serialize())
     keymod_state = KeymodStateStore()
@@ -140,37 +137,43 @@ def callback_context_wrapper(
     send_data(mouse_init.serialize())
     last_mouse_point: tuple[int, int] | None = None
     mouse_button_state = MouseButtonStateStore()
-    movement_queue: queue.Queue[tuple[int, int]] = queue.Queue(maxsize=5)
+    motion_accumulator = MotionAccumulator()
+    input_rate = RateMeter()
+    report_scheduler = ReportScheduler()
+    report_jitter = JitterStats()
     wakeup_counter = 0
 
     def mouse_movement_sender():
-        nonlocal movement_queue, wakeup_counter
+        nonlocal motion_accumulator, wakeup_counter
 
         def send_wakeup_signal() -> CallbackResult:
-            key_down = InjectKeyCode(AKeyCode.AKEYCODE_WAKEUP, AKeyEventAction.AKEY_EVENT_ACTION_DOWN)
-            key_up   = InjectKeyCode(AKeyCode.AKEYCODE_WAKEUP, AKeyEventAction.AKEY_EVENT_ACTION_UP)
-            for key in [key_down, key_up]:
-                res = send_data(key.serialize())
+            for data in WAKEUP_KEY_EVENTS:
+                res = send_data(data)
                 if res is not None: return res
 
-        INTERVAL_SEC = 1 / 125 # the most common mouse polling rate
-        LOOP_FREQUENCY = int(1 / (INTERVAL_SEC * 2))
+        IDLE_INTERVAL_SEC = 1 / DEFAULT_REPORT_RATE
+        LOOP_FREQUENCY = int(1 / (IDLE_INTERVAL_SEC * 2))
         WAKEUP_INTERVAL_SEC = 5
         WAKEUP_COUNT_MODULO = LOOP_FREQUENCY * WAKEUP_INTERVAL_SEC
 
         no_move_timer = time.perf_counter() 
         while True:
-            try:# adapt different polling rates.
-                # when mouse moves, the loop frequency equals polling rate;
-                # when no mouse movement, `movement_queue.get` throws error,
-                # and the loop frequency is `1 / (INTERVAL_SEC * 2)`.
-                dx, dy = movement_queue.get(block=True, timeout=INTERVAL_SEC)
-                event = MouseMoveEvent(dx, dy, mouse_button_state)
-                if (res := send_data(event.serialize())) is not None:
-                    schedule_exit(res); break
+            # when mouse moves, the reports are sent on a steady clock,
+            # at the configured rate or at the measured polling rate;
+            # when no mouse movement, `has_motion.wait` times out,
+            # and the loop frequency is `1 / (IDLE_INTERVAL_SEC * 2)`.
+            if motion_accumulator.has_motion.wait(timeout=IDLE_INTERVAL_SEC):
+                interval_sec = 1 / output_report_rate(get_config().mouse_report_rate, input_rate.rate())
+                if report_scheduler.wait(interval_sec): report_jitter.record(interval_sec)
+                else: report_jitter.restart()
+                # while the sender is congested, keep accumulating instead of queuing more reports
+                if sender.is_congested(): continue
+                for dx, dy in motion_accumulator.take():
+                    event = MouseMoveEvent(dx, dy, mouse_button_state)
+                    if send_data(event.serialize()) is not None: return
                 no_move_timer = None
                 continue
-            except: pass
+            report_scheduler.reset()
 
             # when there is no mouse movement for `WAKEUP_INTERVAL_SEC * 2` seconds
             # and the `keep_wakeup` is True,
@@ -181,19 +184,23 @@ def callback_context_wrapper(
                 if not get_config().keep_wakeup: continue
                 wakeup_counter += 1
                 if wakeup_counter % WAKEUP_COUNT_MODULO or manual_device_sleep: continue
-                if (res := send_wakeup_signal()) is not None:
-                    schedule_exit(res); break
+                if send_wakeup_signal() is not None: break
                 continue
             # when there is no mouse movement within `WAKEUP_INTERVAL_SEC * 2` seconds,
             # send zero movement mouse event.
             event = MouseMoveEvent(0, 0, mouse_button_state)
-            if (res := send_data(event.serialize())) is not None:
-                schedule_exit(res); break
+            if send_data(event.serialize()) is not None: break
     threading.Thread(target=mouse_movement_sender, daemon=True).start()
 
     def mouse_move_callback(cur_x: int, cur_y: int, is_redirecting: bool):
         nonlocal last_mouse_point
         if not is_redirecting or get_config().share_keyboard_only:
+            if last_mouse_point is not None:
+                # drop the motion that is not sent yet
+                motion_accumulator.clear()
+                input_rate_str = "unknown" if (rate := input_rate.rate()) is None else f"{rate:.0f} Hz"
+                LOGGER.write(LogType.Info, f"Mouse motion {motion_accumulator.summary()}, " +
+                                           f"input rate: {input_rate_str}, report jitter: {report_jitter.summary()}")
             last_mouse_point = None
             return None
 
@@ -204,10 +211,10 @@ def callback_context_wrapper(
         if last_mouse_point is None:
             last_mouse_point = (cur_x, cur_y)
             return None
-        diff_movement = _compute_mouse_pointer_diff(cur_x, cur_y, *last_mouse_point)
+        diff_x, diff_y = _compute_mouse_pointer_diff(cur_x, cur_y, *last_mouse_point)
         last_mouse_point = (cur_x, cur_y)
-        try: movement_queue.put(diff_movement, block=False)
-        except queue.Full: movement_queue.get() # if the queue is full, remove the oldest element
+        input_rate.tick()
+        motion_accumulator.add(diff_x, diff_y)
 
     def mouse_click_callback(_cur_x: int, _cur_y: int, button: mouse.Button, pressed: bool, is_redirecting: bool):
         nonlocal last_mouse_point
@@ -244,6 +251,7 @@ def callback_context_wrapper(
     return (
         send_data,
         send_data_async,
+        send_data_bulk,
         keyboard_press_callback,
         keyboard_release_callback,
         mouse_move_callback,
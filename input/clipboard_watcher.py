@@ -0,0 +1,102 @@
+import threading
+import time
+
+from typing import Callable
+from scrcpy_client.clipboard_event import SetClipboardEvent
+from utils import VoidCallable
+from utils.clipboard import CLIPBOARD_STATE, Clipboard, content_digest
+from utils.config_manager import get_config
+from utils.logger import LOGGER, LogType
+
+# the sequence number is a plain counter read, the content polling reads the whole clipboard,
+# which forks a process per read with some backends, and is only done on opt-in
+SEQUENCE_POLL_INTERVAL_SEC = 0.05
+CONTENT_POLL_INTERVAL_SEC = 0.5
+# a change is pushed once the clipboard stayed unchanged for this duration
+DEBOUNCE_SEC = 0.2
+
+def clipboard_watcher_factory(
+    send_data_bulk: Callable[[bytes], None],
+) -> tuple[VoidCallable, VoidCallable]:
+    """
+    Pushes the PC clipboard to the device as soon as it changes,
+    returns `flush` to push a pending change immediately and `stop`.
+    """
+    def read_change_token() -> tuple[int | bytes | None, str | None]:
+        # returns the token identifying the current content,
+        # and the content itself when it had to be read for that
+        sequence_number = Clipboard.sequence_number()
+        if sequence_number is not None: return sequence_number, None
+        text = Clipboard.safe_paste()
+        return (None if text is None else content_digest(text)), text
+
+    def push(text: str | None):
+        nonlocal push_count
+        if not get_config().sync_clipboard: return
+        if text is None: text = Clipboard.safe_paste()
+        if text is None: return
+        if not CLIPBOARD_STATE.should_send(text): return
+        event = SetClipboardEvent(text)
+        if event.is_truncated:
+            LOGGER.write(LogType.Info, f"Clipboard text truncated to {len(event.text)} bytes.")
+        send_data_bulk(event.serialize())
+        push_count += 1
+
+    def take_pending() -> tuple[bool, str | None]:
+        nonlocal pending_since, pending_text
+        with lock:
+            is_pending, text = pending_since is not None, pending_text
+            pending_since = pending_text = None
+        return is_pending, text
+
+    def watcher():
+        nonlocal last_token, pending_since, pending_text
+        if not is_watching:
+            LOGGER.write(LogType.Info, "No clipboard change counter, the clipboard is read before each toggle.")
+            return
+        poll_interval = SEQUENCE_POLL_INTERVAL_SEC if is_sequence_available else CONTENT_POLL_INTERVAL_SEC
+        # the content present at startup is not pushed
+        last_token, _ = read_change_token()
+        while not stop_event.wait(poll_interval):
+            if not get_config().sync_clipboard: continue
+            token, text = read_change_token()
+            current_time = time.perf_counter()
+            with lock:
+                if token is not None and token != last_token:
+                    # every change of a burst restarts the debounce
+                    last_token = token
+                    pending_since, pending_text = current_time, text
+                    # also the changes made by applying a device content,
+                    # their echoes are filtered by `should_send`
+                    CLIPBOARD_STATE.note_local_change()
+                is_due = pending_since is not None and\
+                         current_time - pending_since >= DEBOUNCE_SEC
+            if not is_due: continue
+            is_pending, text = take_pending()
+            if is_pending: push(text)
+        LOGGER.write(LogType.Info, f"Clipboard watcher stopped, {push_count} contents pushed.")
+
+    def flush():
+        # called before toggling to the device, so the latest content is there before the first paste
+        is_pending, text = take_pending()
+        if is_pending: push(text); return
+        if not is_watching:
+            # `should_send` skips the content already sent
+            push(None)
+
+    def stop():
+        stop_event.set()
+        thread.join()
+
+    lock = threading.Lock()
+    stop_event = threading.Event()
+    last_token: int | bytes | None = None
+    pending_since: float | None = None
+    pending_text: str | None = None
+    push_count = 0
+    is_sequence_available = Clipboard.sequence_number() is not None
+    is_watching = is_sequence_available or get_config().clipboard_content_polling
+    CLIPBOARD_STATE.set_local_changes_tracked(is_watching)
+    thread = threading.Thread(target=watcher, daemon=True)
+    thread.start()
+    return flush, stop
@@ -2,17 +2,19 @@ import threading
 import time
 from pynput import keyboard, mouse
 from input import EXIT_KEY_COMBINATION, SWITCH_KEY_COMBINATION
-from scrcpy_client.clipboard_event import GetClipboardEvent, SetClipboardEvent
+from scrcpy_client.clipboard_event import GetClipboardEvent
 from scrcpy_client.hid_event import KeyEmptyEvent
 from input.callbacks import KeyEventCallback,\
     MouseClickCallback, MouseMoveCallback, MouseScrollCallback,\
     SendDataCallback, SendDataAsyncCallback
-from input.edge_portal import edge_portal_thread_factory
-from server.scrcpy_receiver import ReceivedClipboardText
+from input.clipboard_watcher import clipboard_watcher_factory
+from input.edge_portal import MouseMoveHandler, edge_portal_factory
 from ui.fullscreen_mask import mask_thread_factory
-from utils.clipboard import Clipboard
 from utils.config_manager import get_config
 from utils.logger import LOGGER, LogType
+from utils.profiling import STARTUP_PROFILER
+from utils.timeline import STARTUP_TIMELINE
+from utils.tracing import TRACER
 
 is_redirecting = False
 keyboard_controller = keyboard.Controller()
@@ -34,6 +36,7 @@ def schedule_toggle(force: bool | None = None):
         keyboard_controller.release(keyboard.Key.ctrl)
         keyboard_controller.release(keyboard.Key.alt)
     is_redirecting = force if force is not None else not is_redirecting
+    TRACER.instant("toggle scheduled", is_redirecting=is_redirecting, by_hotkey=force is None)
     toggle_event.set()
 
 def schedule_exit(errno: Exception | None = None):
@@ -70,10 +73,13 @@ def keyboard_release_handler_factory(callback: KeyEventCallback):
         callback(canonical_k, is_redirecting)
     return keyboard_release_handler
 
-def mouse_move_handler_factory(callback: MouseMoveCallback):
+def mouse_move_handler_factory(callback: MouseMoveCallback, edge_portal_handler: MouseMoveHandler):
     def mouse_move_handler(x: int, y: int):
         global is_redirecting
         callback(x, y, is_redirecting)
+        # after the callback, so that the position wrapped by the edge portal
+        # is what the next callback sees as `edge_portal_passing_event`
+        edge_portal_handler(x, y)
     return mouse_move_handler
 
 def mouse_click_handler_factory(callback: MouseClickCallback):
@@ -91,6 +97,7 @@ def mouse_scroll_handler_factory(callback: MouseScrollCallback):
 def main_loop(
     send_data: SendDataCallback,
     send_data_async: SendDataAsyncCallback,
+    send_data_bulk: SendDataAsyncCallback,
     keyboard_press_callback: KeyEventCallback,
     keyboard_release_callback: KeyEventCallback,
     mouse_move_callback: MouseMoveCallback,
@@ -100,41 +107,47 @@ def main_loop(
     global is_redirecting, keyboard_listener, main_errno, toggle_event
 
     def before_toggle(is_redirecting: bool):
-        if is_redirecting:
-            last_received = ReceivedClipboardText.read()
-            current_clipboard_content = Clipboard.safe_paste()
-            if exit_event.is_set(): return
-            if not get_config().sync_clipboard: return
-            if current_clipboard_content is None: return
-            if last_received is not None and\
-               last_received == current_clipboard_content: return
-            send_data_async(SetClipboardEvent(current_clipboard_content).serialize())
+        # the clipboard is pushed by the watcher when it changes,
+        # only the change still in its debounce is pushed here
+        if is_redirecting and not exit_event.is_set():
+            flush_clipboard_watcher()
 
     def after_toggle(is_redirecting: bool):
         nonlocal show_mask, hide_mask,\
-            start_edge_portal, pause_edge_portal
+            start_edge_portal, pause_edge_portal, has_forwarded_input
         if is_redirecting:
             if not get_config().share_keyboard_only:
-                show_mask(); start_edge_portal()
+                show_mask(last_toggling_time); start_edge_portal()
             LOGGER.write(LogType.Info, "Input redirecting enabled.")
+            if not has_forwarded_input:
+                has_forwarded_input = True
+                STARTUP_TIMELINE.mark("first input forwarded")
+                STARTUP_TIMELINE.log()
         else:
             send_data(KeyEmptyEvent().serialize())
             hide_mask(); pause_edge_portal()
             LOGGER.write(LogType.Info, "Input redirecting disabled.")
 
     main_errno = send_data(GetClipboardEvent().serialize()) # start server clipboard sync
+    has_forwarded_input = False
     show_mask, hide_mask, exit_mask = mask_thread_factory()
-    start_edge_portal, pause_edge_portal, close_edge_portal = edge_portal_thread_factory()
+    flush_clipboard_watcher, stop_clipboard_watcher = clipboard_watcher_factory(send_data_bulk)
+    start_edge_portal, pause_edge_portal, close_edge_portal, edge_portal_handler = edge_portal_factory()
 
     keyboard_listener = None
     mouse_listener = mouse.Listener(
-        on_move=mouse_move_handler_factory(mouse_move_callback),
+        on_move=mouse_move_handler_factory(mouse_move_callback, edge_portal_handler),
         on_click=mouse_click_handler_factory(mouse_click_callback),
         on_scroll=mouse_scroll_handler_factory(mouse_scroll_callback),
     )
     mouse_listener.start()
+    STARTUP_TIMELINE.mark("input ready")
+    if STARTUP_PROFILER.is_enabled: STARTUP_PROFILER.report("input ready")
+    else: STARTUP_TIMELINE.log()
     while not exit_event.is_set() and main_errno is None:
-        if (res := after_toggle(is_redirecting)) is not None:
+        with TRACER.span("after_toggle", is_redirecting=is_redirecting):
+            res = after_toggle(is_redirecting)
+        if res is not None:
             main_errno = res; break
 
         keyboard_listener = keyboard.Listener(
@@ -145,10 +158,12 @@ def main_loop(
         keyboard_listener.start()
         toggle_event.wait()
         toggle_event.clear()
-        before_toggle(is_redirecting)
-        keyboard_listener.stop()
+        with TRACER.span("toggle", is_redirecting=is_redirecting):
+            before_toggle(is_redirecting)
+            keyboard_listener.stop()
 
     mouse_listener.stop()
     exit_mask()
     close_edge_portal()
+    stop_clipboard_watcher()
     return main_errno
@@ -1,4 +1,3 @@
-import time
 import threading
 import pynput
 
@@ -8,7 +7,7 @@ from utils import VoidCallable, screen_size
 from utils.config_manager import get_config
 from utils.logger import LOGGER, LogType
 
-EDGE_PORTAL_LOOP_INTERVAL_SEC = 1 / 1000
+MouseMoveHandler = Callable[[int, int], None]
 
 screen_width, screen_height = screen_size()
 mouse_controller = pynput.mouse.Controller()
@@ -44,7 +43,13 @@ def resume_edge_toggling():
     LOGGER.write(LogType.Info, "Edge toggling resumed.")
     pause_edge_toggling_event.clear()
 
-def create_edge_portal():
+def edge_portal_factory() -> tuple[
+    VoidCallable, VoidCallable, VoidCallable, MouseMoveHandler,
+]:
+    """
+    The edge portal is driven by the coordinates the mouse listener already
+    receives, so nothing runs while the mouse is still.
+    """
     from input.controller import schedule_toggle as main_schedule_toggle
 
     def return_to_before_toggling():
@@ -60,33 +65,27 @@ def create_edge_portal():
     append_edge_toggling_callback(return_to_before_toggling)
     cursor_pos_before_toggling = None
 
-    while not close_event.is_set():
-        temp_pos = mouse_controller.position
-        if temp_pos == None:
-            # since the value of `mouse_controller.position` may be None sometimes,
-            # make it a check here.
-            # see this issue: https://github.com/moses-palmer/pynput/issues/559
-            time.sleep(EDGE_PORTAL_LOOP_INTERVAL_SEC)
-            continue
-        x, y = temp_pos
+    def edge_portal_move_handler(x: int, y: int):
+        nonlocal cursor_pos_before_toggling
+        if close_event.is_set(): return
         is_at_left_side = x <= 0
         is_at_right_side = x >= screen_width - 1
         is_at_top_side = y <= 0
         is_at_bottom_side = y >= screen_height - 1
 
         if pause_event.is_set():
-            if not is_edge_toggling_enabled or pause_edge_toggling_event.is_set():
-                time.sleep(EDGE_PORTAL_LOOP_INTERVAL_SEC)
-                continue
+            if not is_edge_toggling_enabled or pause_edge_toggling_event.is_set(): return
             is_y_at_target_range = trigger_margin < y < screen_height - trigger_margin
             if (is_device_at_right  and is_at_right_side and is_y_at_target_range) or\
                (is_device_at_left   and is_at_left_side  and is_y_at_target_range) or\
                (is_device_at_top    and is_at_top_side)    or\
                (is_device_at_bottom and is_at_bottom_side):
-                cursor_pos_before_toggling = temp_pos
+                cursor_pos_before_toggling = (x, y)
                 main_schedule_toggle(True)
         else:
             if is_at_left_side or is_at_right_side or is_at_top_side or is_at_bottom_side:
+                # the next `on_move` is the wrapped position,
+                # it must not be taken as a movement
                 edge_portal_passing_event.set()
             if is_at_left_side:
                 mouse_controller.move(screen_width - 1, 0)
@@ -97,19 +96,13 @@ def create_edge_portal():
             if is_at_bottom_side:
                 mouse_controller.move(0, 1 - screen_height)
 
-        time.sleep(EDGE_PORTAL_LOOP_INTERVAL_SEC)
-    LOGGER.write(LogType.Info, "Edge portal closed.")
-
-def edge_portal_thread_factory() -> tuple[
-    VoidCallable, VoidCallable, VoidCallable
-]:
     def start_edge_portal():
         pause_event.clear()
     def pause_edge_portal():
         pause_event.set()
     def close_edge_portal():
         close_event.set()
+        LOGGER.write(LogType.Info, "Edge portal closed.")
 
     pause_event.set()
-    threading.Thread(target=create_edge_portal, daemon=True).start()
-    return start_edge_portal, pause_edge_portal, close_edge_portal
+    return start_edge_portal, pause_edge_portal, close_edge_portal, edge_portal_move_handler
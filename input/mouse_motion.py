@@ -0,0 +1,179 @@
+import math
+import threading
+import time
+
+from collections import deque
+
+from scrcpy_client.hid_event import HID_AXIS_MAX
+from utils.precise_timer import COARSE_TIMER_RESOLUTION_SEC, PreciseSleeper
+
+class MotionAccumulator:
+    """
+    Sums the mouse deltas between two HID reports without losing any motion:
+    the fractional remainders are carried to the next report and the moves
+    larger than one HID report can hold are split into several reports.
+    """
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__dx = 0.0
+        self.__dy = 0.0
+        self.__pending = 0
+        self.has_motion = threading.Event()
+
+        # deltas merged into a report that already had pending motion
+        self.merged_count = 0
+        # extra reports produced by splitting moves larger than `HID_AXIS_MAX`
+        self.split_count = 0
+
+    def add(self, dx: float, dy: float):
+        with self.__lock:
+            self.__dx += dx
+            self.__dy += dy
+            if self.__pending > 0: self.merged_count += 1
+            self.__pending += 1
+        self.has_motion.set()
+
+    def clear(self):
+        with self.__lock:
+            self.__dx = self.__dy = 0.0
+            self.__pending = 0
+        self.has_motion.clear()
+
+    def take(self) -> list[tuple[int, int]]:
+        """
+        Returns the accumulated motion as HID-sized deltas,
+        the sub-pixel remainders are kept for the next call.
+        """
+        with self.__lock:
+            total_x = int(self.__dx)
+            total_y = int(self.__dy)
+            self.__dx -= total_x
+            self.__dy -= total_y
+            self.__pending = 0
+            self.has_motion.clear()
+        if total_x == 0 and total_y == 0: return []
+
+        report_count = math.ceil(max(abs(total_x), abs(total_y)) / HID_AXIS_MAX)
+        if report_count == 1: return [(total_x, total_y)]
+
+        self.split_count += report_count - 1
+        # distribute the motion evenly, the partial sums always end exactly at the totals
+        reports: list[tuple[int, int]] = []
+        sent_x = sent_y = 0
+        for i in range(1, report_count + 1):
+            target_x = total_x * i // report_count
+            target_y = total_y * i // report_count
+            reports.append((target_x - sent_x, target_y - sent_y))
+            sent_x, sent_y = target_x, target_y
+        return reports
+
+    def summary(self) -> str:
+        return f"merged deltas: {self.merged_count}, split reports: {self.split_count}"
+
+class RateMeter:
+    """
+    Measures the rate of a bursty event source (e.g. `on_move` callbacks),
+    the gaps longer than `max_gap_sec` are treated as idle time and ignored.
+    """
+    SMOOTHING = 0.05
+
+    def __init__(self, max_gap_sec: float=0.1) -> None:
+        self.max_gap_sec = max_gap_sec
+        self.__last_time: float | None = None
+        self.__mean_interval: float | None = None
+
+    def tick(self):
+        current_time = time.perf_counter()
+        last_time, self.__last_time = self.__last_time, current_time
+        if last_time is None: return
+        interval = current_time - last_time
+        if interval <= 0 or interval > self.max_gap_sec: return
+        if self.__mean_interval is None:
+            self.__mean_interval = interval
+        else: # exponential moving average
+            self.__mean_interval += (interval - self.__mean_interval) * RateMeter.SMOOTHING
+
+    def rate(self) -> float | None:
+        if self.__mean_interval is None: return None
+        return 1 / self.__mean_interval
+
+class JitterStats:
+    """
+    Records the deviation of the actual report intervals from the scheduled ones.
+    """
+    MAX_SAMPLES = 2048
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__samples: deque[float] = deque(maxlen=JitterStats.MAX_SAMPLES)
+        self.__last_time: float | None = None
+
+    def record(self, expected_interval: float):
+        current_time = time.perf_counter()
+        with self.__lock:
+            if self.__last_time is not None:
+                self.__samples.append(abs(current_time - self.__last_time - expected_interval))
+            self.__last_time = current_time
+
+    def restart(self):
+        # called when the motion stops, the idle gap is not jitter
+        with self.__lock: self.__last_time = None
+
+    def summary(self) -> str:
+        with self.__lock: samples = sorted(self.__samples)
+        if len(samples) == 0: return "no samples"
+        mean = sum(samples) / len(samples)
+        p95 = samples[int(len(samples) * 0.95) - 1] if len(samples) >= 20 else samples[-1]
+        return f"mean {mean * 1000:.3f} ms, p95 {p95 * 1000:.3f} ms, max {samples[-1] * 1000:.3f} ms " +\
+               f"over {len(samples)} reports"
+
+class ReportScheduler:
+    """
+    Paces the reports on a steady monotonic clock: the deadlines are spaced by
+    exactly one interval, so the sleep overshoots do not accumulate.
+    Where no timer finer than the report interval is available (Windows before
+    Python 3.11 without a high resolution timer), the reports are not paced.
+    """
+    def __init__(self) -> None:
+        self.__deadline: float | None = None
+        self.__sleeper = PreciseSleeper()
+
+    def reset(self):
+        self.__deadline = None
+
+    def wait(self, interval_sec: float) -> bool:
+        """
+        Sleeps until the next report is due.
+        Returns False when the report is not paced by the clock,
+        i.e. it is the first one after idle, the schedule fell behind
+        or the interval is below the timer resolution.
+        """
+        current_time = time.perf_counter()
+        if not self.__sleeper.is_precise and interval_sec < COARSE_TIMER_RESOLUTION_SEC:
+            self.__deadline = None
+            return False
+        if self.__deadline is None:
+            # the first report after idle is sent immediately
+            self.__deadline = current_time
+            return False
+        self.__deadline += interval_sec
+        remaining = self.__deadline - current_time
+        if remaining > 0:
+            self.__sleeper.sleep_until(self.__deadline)
+        elif remaining < -interval_sec:
+            # fell behind by more than one report, skip the missed ticks
+            self.__deadline = current_time
+            return False
+        return True
+
+MIN_REPORT_RATE = 60
+MAX_REPORT_RATE = 1000
+DEFAULT_REPORT_RATE = 125 # the most common mouse polling rate
+
+def output_report_rate(configured_rate: int, input_rate: float | None) -> float:
+    # `configured_rate` is 0 to follow the measured input rate
+    if configured_rate > 0:
+        return min(configured_rate, MAX_REPORT_RATE)
+    if input_rate is None:
+        return DEFAULT_REPORT_RATE
+    return min(max(input_rate, MIN_REPORT_RATE), MAX_REPORT_RATE)
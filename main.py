@@ -1,20 +1,34 @@
-import socket
 import sys
-from typing import Callable
+from utils.profiling import PROFILE_STARTUP_FLAG, STARTUP_PROFILER
+# started before the other imports, so that they are measured
+if PROFILE_STARTUP_FLAG in sys.argv: STARTUP_PROFILER.start()
+from utils.tracing import TRACE_FLAG, TRACER, default_trace_path
+if TRACE_FLAG in sys.argv: TRACER.enable(default_trace_path())
+
+import socket
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable
 
-from adbutils import AdbInstallError
 from multiprocessing import freeze_support
-from server import deploy_reporter_server, deploy_scrcpy_server, scrcpy_receiver, reporter_receiver
-from input.callbacks import callback_context_wrapper
 from ui.connecting_window import open_connecting_window
-from ui.tray import tray_thread_factory
-from utils.adb_controller import ADBWiredConnectionError, append_adb_device, get_adb_client, start_adb_server
+from utils.adb_controller import ADBWiredConnectionError, append_adb_device, get_adb_client, get_adb_device, start_adb_server
+from utils.adb_session import close_adb_sessions
 from utils.config_manager import get_config
 from utils.i18n import get_i18n
 from utils.logger import LogType, LOGGER
 from utils.notification import Notification, send_notification
+from utils.timeline import STARTUP_TIMELINE
+
+# the modules below are only needed once a device is connected,
+# they are imported after the connecting window is shown
+if TYPE_CHECKING:
+    from adbutils import AdbDevice
 
 def close_notification_resolver(errno: Exception | None):
+    from adbutils import AdbInstallError
+    from server import scrcpy_receiver
+
     close_notification = None
     i18n = get_i18n()
     match errno:
@@ -49,11 +63,25 @@ def close_notification_resolver(errno: Exception | None):
     LOGGER.write(LogType.Info, "Program terminated with: " + str(close_notification))
     send_notification(close_notification)
 
+def timed_deploy(label: str, deploy: Callable[["AdbDevice"], Any], device: "AdbDevice") -> Any:
+    start_time = time.perf_counter()
+    try:
+        with TRACER.span(label): res = deploy(device)
+    except Exception as e:
+        LOGGER.write(LogType.Error, f"Deploying error ({label}): " + str(e))
+        res = e
+    STARTUP_TIMELINE.record_duration(label, time.perf_counter() - start_time)
+    STARTUP_TIMELINE.mark(label)
+    return res
+
 if __name__ == "__main__":
     freeze_support()
 
+    STARTUP_TIMELINE.mark("modules imported")
     start_adb_server()
-    is_wired_connection = open_connecting_window()
+    STARTUP_TIMELINE.mark("adb server started")
+    with TRACER.span("open_connecting_window"):
+        is_wired_connection = open_connecting_window()
     if is_wired_connection:
         device_list = get_adb_client().device_list()
         if len(device_list) == 0:
@@ -62,7 +90,26 @@ if __name__ == "__main__":
             sys.exit(1)
         append_adb_device(device_list[0])
 
-    res = deploy_scrcpy_server()
+    STARTUP_TIMELINE.mark("device connected")
+    from server import deploy_reporter_server, deploy_scrcpy_server,\
+                       scrcpy_receiver, scrcpy_sender, reporter_receiver
+    from input.callbacks import callback_context_wrapper
+    from ui.tray import tray_thread_factory
+    STARTUP_TIMELINE.mark("device modules imported")
+
+    primary_device = get_adb_device()
+    if isinstance(primary_device, Exception):
+        close_notification_resolver(primary_device)
+        sys.exit(1)
+
+    # the reporter is deployed in parallel with the scrcpy server, sharing the device handle
+    deploy_executor = ThreadPoolExecutor(max_workers=1)
+    reporter_deployment: Future | None = None
+    if get_config().edge_toggling:
+        reporter_deployment = deploy_executor.submit(
+            timed_deploy, "reporter deployed", deploy_reporter_server, primary_device)
+
+    res = timed_deploy("scrcpy deployed", deploy_scrcpy_server, primary_device)
     if isinstance(res, Exception):
         close_notification_resolver(res)
         sys.exit(1)
@@ -71,23 +118,29 @@ if __name__ == "__main__":
     stop_scrcpy_receiver = scrcpy_receiver.server_receiver_factory(scrcpy_client_socket)
     stop_reporter_receiver: Callable | None = None
 
-    if get_config().edge_toggling:
-        res = deploy_reporter_server()
+    if reporter_deployment is not None:
+        res = reporter_deployment.result()
         if isinstance(res, Exception):
             close_notification_resolver(res)
             sys.exit(1)
         stop_reporter_receiver = reporter_receiver.server_receiver_factory()
+    deploy_executor.shutdown()
 
-    close_tray = tray_thread_factory(scrcpy_client_socket)
-    callbacks  = callback_context_wrapper(scrcpy_client_socket)
+    control_sender = scrcpy_sender.ControlSender(
+        scrcpy_client_socket,
+        flush_window_sec=get_config().send_flush_window_ms / 1000)
+    close_tray = tray_thread_factory(control_sender)
+    callbacks  = callback_context_wrapper(control_sender)
 
     from input.controller import main_loop
     main_errno = main_loop(*callbacks)
 
     LOGGER.write(LogType.Info, "Terminated, closing...")
+    control_sender.stop()
     stop_scrcpy_receiver()
     stop_reporter_receiver and stop_reporter_receiver() # type: ignore
     scrcpy_server_process.terminate()
+    close_adb_sessions()
 
     close_notification_resolver(main_errno)
     close_tray()
@@ -13,17 +13,21 @@ class DeviceMsgType(IntEnum):
     DEVICE_MSG_TYPE_ACK_CLIPBOARD = 1
     DEVICE_MSG_TYPE_UHID_OUTPUT = 2
 
+MSG_TYPE_SET_CLIPBOARD = ControlMsgType.MSG_TYPE_SET_CLIPBOARD.value
+# type (8) + sequence (64) + paste (8) + text length (32)
+SET_CLIPBOARD_HEADER = struct.Struct(">BQBI")
+# the same limit as the scrcpy client, a control message is at most 256 KiB
+CLIPBOARD_TEXT_MAX_LENGTH = (1 << 18) - 14
+CLIPBOARD_LENGTH = struct.Struct(">I")
+
 class GetClipboardEvent:
+    __slots__ = ()
     msg_type: ControlMsgType = ControlMsgType.MSG_TYPE_GET_CLIPBOARD
     copy_key: CopyKey = CopyKey.COPY_KEY_COPY
+    payload: bytes = struct.pack(">BB", msg_type.value, copy_key.value)
 
     def serialize(self) -> bytes:
-        buf = struct.pack(
-            ">BB",
-            self.msg_type.value,
-            self.copy_key.value,
-        )
-        return buf
+        return self.payload
 
 class GetClipboardEventResponse:
     @staticmethod
@@ -34,26 +38,26 @@ class GetClipboardEventResponse:
         if len(data) < 5:
             # at least type + empty string length
             return None
-        clipboard_len: int = struct.unpack(">I", data[1:5])[0]
+        clipboard_len: int = CLIPBOARD_LENGTH.unpack_from(data, 1)[0]
         if clipboard_len > len(data) - 5:
             return None
-        return data[5:].decode("utf-8")
+        return data[5:5 + clipboard_len].decode("utf-8")
 
 class SetClipboardEvent:
+    __slots__ = ("text", "is_truncated")
     msg_type: ControlMsgType = ControlMsgType.MSG_TYPE_SET_CLIPBOARD
     sequence: int = 0 # 8
     paste: int = 0 # 1
 
     def __init__(self, text: str) -> None:
-        self.text = bytes(text, encoding="utf-8")
+        encoded = text.encode("utf-8")
+        self.is_truncated = len(encoded) > CLIPBOARD_TEXT_MAX_LENGTH
+        if self.is_truncated:
+            # cut at a character boundary
+            encoded = encoded[:CLIPBOARD_TEXT_MAX_LENGTH].decode("utf-8", errors="ignore").encode("utf-8")
+        self.text = encoded
 
     def serialize(self) -> bytes:
-        buf = struct.pack(
-            ">BQBI",
-            self.msg_type.value,
-            self.sequence,
-            self.paste,
-            len(self.text),
-        )
-        buf += self.text
-        return buf
+        header = SET_CLIPBOARD_HEADER.pack(
+            MSG_TYPE_SET_CLIPBOARD, self.sequence, self.paste, len(self.text))
+        return header + self.text
@@ -0,0 +1,119 @@
+import struct
+
+from dataclasses import dataclass
+from typing import Iterator
+from scrcpy_client.clipboard_event import DeviceMsgType
+
+# type (8) + text length (32)
+CLIPBOARD_HEADER = struct.Struct(">BI")
+# type (8) + sequence (64)
+ACK_CLIPBOARD = struct.Struct(">BQ")
+# type (8) + id (16) + data size (16)
+UHID_OUTPUT_HEADER = struct.Struct(">BHH")
+
+@dataclass
+class ClipboardMsg:
+    text: str
+
+@dataclass
+class AckClipboardMsg:
+    sequence: int
+
+@dataclass
+class UhidOutputMsg:
+    id_: int
+    data: bytes
+
+DeviceMsg = ClipboardMsg | AckClipboardMsg | UhidOutputMsg
+
+class InvalidDeviceMsgException(Exception): pass
+
+class DeviceMsgParser:
+    """
+    Incremental parser for the messages sent by the scrcpy server.
+    The socket reads directly into `writable()`, messages may span any number
+    of reads and one read may carry any number of messages.
+    """
+    INITIAL_BUFFER_SIZE = 64 * 1024
+    MIN_READ_SIZE = 4 * 1024
+    MAX_MSG_SIZE = 64 * 1024 * 1024
+
+    def __init__(self) -> None:
+        self.__buffer = bytearray(DeviceMsgParser.INITIAL_BUFFER_SIZE)
+        self.__view = memoryview(self.__buffer)
+        self.__start = 0 # the first byte not consumed yet
+        self.__end = 0 # the end of the received data
+        self.__expected_size = 0 # the size of the incomplete message, if known
+
+    def writable(self) -> memoryview:
+        # make sure the incomplete message fits, so large clipboards are
+        # received without growing the buffer more than a few times
+        pending = self.__end - self.__start
+        required_size = max(self.__expected_size, pending + DeviceMsgParser.MIN_READ_SIZE)
+        if self.__start + required_size > len(self.__buffer):
+            self.__reallocate(required_size)
+        return self.__view[self.__end:]
+
+    def commit(self, size: int):
+        # `size` bytes are written into the view returned by `writable()`
+        self.__end += size
+
+    def messages(self) -> Iterator[DeviceMsg]:
+        while True:
+            msg = self.__parse_one()
+            if msg is None: break
+            yield msg
+        if self.__start == self.__end:
+            self.__start = self.__end = 0
+            if len(self.__buffer) > DeviceMsgParser.INITIAL_BUFFER_SIZE:
+                # release the memory used by a large clipboard
+                self.__reallocate(DeviceMsgParser.INITIAL_BUFFER_SIZE)
+
+    def __reallocate(self, required_size: int):
+        # move the unconsumed data to the beginning of a buffer of at least `required_size`
+        new_size = DeviceMsgParser.INITIAL_BUFFER_SIZE
+        while new_size < required_size: new_size *= 2
+        pending = self.__end - self.__start
+        new_buffer = bytearray(new_size)
+        new_buffer[:pending] = self.__view[self.__start:self.__end]
+        self.__view.release()
+        self.__buffer = new_buffer
+        self.__view = memoryview(new_buffer)
+        self.__start, self.__end = 0, pending
+
+    def __expect(self, size: int) -> bool:
+        if size > DeviceMsgParser.MAX_MSG_SIZE:
+            raise InvalidDeviceMsgException(f"Device message too large: {size} bytes")
+        if self.__end - self.__start >= size:
+            self.__expected_size = 0
+            return True
+        self.__expected_size = size
+        return False
+
+    def __parse_one(self) -> DeviceMsg | None:
+        start, view = self.__start, self.__view
+        if self.__end - start < 1: return None
+        match view[start]:
+            case DeviceMsgType.DEVICE_MSG_TYPE_CLIPBOARD:
+                if not self.__expect(CLIPBOARD_HEADER.size): return None
+                _, text_len = CLIPBOARD_HEADER.unpack_from(view, start)
+                msg_size = CLIPBOARD_HEADER.size + text_len
+                if not self.__expect(msg_size): return None
+                text = str(view[start + CLIPBOARD_HEADER.size:start + msg_size], "utf-8")
+                msg = ClipboardMsg(text)
+            case DeviceMsgType.DEVICE_MSG_TYPE_ACK_CLIPBOARD:
+                msg_size = ACK_CLIPBOARD.size
+                if not self.__expect(msg_size): return None
+                _, sequence = ACK_CLIPBOARD.unpack_from(view, start)
+                msg = AckClipboardMsg(sequence)
+            case DeviceMsgType.DEVICE_MSG_TYPE_UHID_OUTPUT:
+                if not self.__expect(UHID_OUTPUT_HEADER.size): return None
+                _, id_, data_size = UHID_OUTPUT_HEADER.unpack_from(view, start)
+                msg_size = UHID_OUTPUT_HEADER.size + data_size
+                if not self.__expect(msg_size): return None
+                msg = UhidOutputMsg(id_, bytes(view[start + UHID_OUTPUT_HEADER.size:start + msg_size]))
+            case msg_type:
+                # the message boundaries are lost, the stream can not be recovered
+                raise InvalidDeviceMsgException(f"Unknown device message type: {msg_type}")
+        self.__start += msg_size
+        return msg
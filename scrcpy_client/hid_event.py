@@ -1,120 +1,122 @@
 import struct
 
 from scrcpy_client import ControlMsgType
-from scrcpy_client.hid_def import HID_ID_KEYBOARD, HID_ID_MOUSE, HID_KEYBOARD_INPUT_SIZE, HID_KEYBOARD_REPORT_DESC, HID_MOUSE_INPUT_SIZE, HID_MOUSE_REPORT_DESC, KeymodStateStore, MouseButtonStateStore
+from scrcpy_client.hid_def import HID_ID_KEYBOARD, HID_ID_MOUSE, HID_KEYBOARD_INPUT_SIZE, HID_KEYBOARD_MAX_KEYS, HID_KEYBOARD_REPORT_DESC, HID_MOUSE_INPUT_SIZE, HID_MOUSE_REPORT_DESC, KeymodStateStore, MouseButtonStateStore
 from scrcpy_client.sdl_def import SDL_Scancode
 from utils import clamp
 
+# Enum `.value` lookups are resolved once here instead of for every event
+MSG_TYPE_UHID_CREATE = ControlMsgType.MSG_TYPE_UHID_CREATE.value
+MSG_TYPE_UHID_INPUT  = ControlMsgType.MSG_TYPE_UHID_INPUT.value
+
+# type (8) + id (16) + name (8) + report desc size (16)
+UHID_CREATE_HEADER = struct.Struct(">BHBH")
+# type (8) + id (16) + size (16) + mod key (8) + reserved (8) + keys (8 * 6)
+UHID_KEYBOARD_INPUT = struct.Struct(">BHHBB" + "B" * HID_KEYBOARD_MAX_KEYS)
+# type (8) + id (16) + size (16) + buttons (8) + x (8) + y (8) + wheel (8)
+UHID_MOUSE_INPUT = struct.Struct(">BHHBbbb")
+
+HID_AXIS_MIN = -127
+HID_AXIS_MAX = 127
+
+def _serialize_uhid_create(id_: int, report_desc: bytes) -> bytes:
+    buf = bytearray(UHID_CREATE_HEADER.size + len(report_desc))
+    UHID_CREATE_HEADER.pack_into(buf, 0, MSG_TYPE_UHID_CREATE, id_, 0, len(report_desc))
+    buf[UHID_CREATE_HEADER.size:] = report_desc
+    return bytes(buf)
+
 class HIDKeyboardInitEvent:
+    __slots__ = ()
     msg_type: ControlMsgType = ControlMsgType.MSG_TYPE_UHID_CREATE # 8
     id_ = HID_ID_KEYBOARD # 16
     name = 0 # 8
     report_desc_size: int = len(HID_KEYBOARD_REPORT_DESC) # 16
     report_desc: bytes = HID_KEYBOARD_REPORT_DESC
+    payload: bytes = _serialize_uhid_create(HID_ID_KEYBOARD, HID_KEYBOARD_REPORT_DESC)
+
     def serialize(self) -> bytes:
-        buf = struct.pack(
-            ">BHBH",
-            self.msg_type.value,
-            self.id_,
-            self.name,
-            self.report_desc_size,
-        )
-        buf += self.report_desc
-        return buf
+        return self.payload
 
 class HIDKeyboardInputEvent:
+    __slots__ = ("mod_key", "keys")
     msg_type: ControlMsgType = ControlMsgType.MSG_TYPE_UHID_INPUT # 8
     id_: int = HID_ID_KEYBOARD # 16
     size: int = HID_KEYBOARD_INPUT_SIZE # 16
 
-    def __init__(self, data: list[int]) -> None:
-        self.data = bytes(data)
-    
+    def __init__(self, mod_key: int, keys: tuple[int, ...]) -> None:
+        # `keys` always has `HID_KEYBOARD_MAX_KEYS` items, unused ones are 0
+        self.mod_key = mod_key
+        self.keys = keys
+
     def serialize(self) -> bytes:
-        buf = struct.pack(
-            ">BHH",
-            self.msg_type.value,
-            self.id_,
-            self.size,
-        )
-        buf += self.data
-        return buf
+        return UHID_KEYBOARD_INPUT.pack(
+            MSG_TYPE_UHID_INPUT, HID_ID_KEYBOARD, HID_KEYBOARD_INPUT_SIZE,
+            self.mod_key, 0, *self.keys)
+
+EMPTY_KEYS = (0,) * HID_KEYBOARD_MAX_KEYS
 
 def KeyEvent(keymod: KeymodStateStore, keys: list[SDL_Scancode]) -> HIDKeyboardInputEvent:
-    # [_, _, _, _, _, _, _, _]
-    # length: 8
     # 0 -> mod key
     # 1 -> reserved, always 0
     # 2 - 7 -> keys pressed the same time (scancode)
-    data: list[int] = [0] * HIDKeyboardInputEvent.size
-    data[0] = keymod.key
+    key_values = tuple(keys[:HID_KEYBOARD_MAX_KEYS]) + EMPTY_KEYS[len(keys):]
+    return HIDKeyboardInputEvent(keymod.key, key_values)
+
+class HIDKeyEmptyEvent(HIDKeyboardInputEvent):
+    __slots__ = ()
+    payload: bytes = UHID_KEYBOARD_INPUT.pack(
+        MSG_TYPE_UHID_INPUT, HID_ID_KEYBOARD, HID_KEYBOARD_INPUT_SIZE, 0, 0, *EMPTY_KEYS)
 
-    data_ptr = 2
-    for k in keys:
-        data[data_ptr] = k.value
-        data_ptr += 1
-    keyboard_event = HIDKeyboardInputEvent(data)
-    return keyboard_event
+    def __init__(self) -> None:
+        super().__init__(0, EMPTY_KEYS)
 
+    def serialize(self) -> bytes:
+        return self.payload
+
+KEY_EMPTY_EVENT = HIDKeyEmptyEvent()
 def KeyEmptyEvent() -> HIDKeyboardInputEvent:
-    data = [0] * HIDKeyboardInputEvent.size
-    keyboard_event = HIDKeyboardInputEvent(data)
-    return keyboard_event
+    return KEY_EMPTY_EVENT
 
 # --- --- --- --- --- ---
 
 class HIDMouseInitEvent:
+    __slots__ = ()
     msg_type: ControlMsgType = ControlMsgType.MSG_TYPE_UHID_CREATE # 8
     id_: int = HID_ID_MOUSE # 16
     name = 0 # 8
     report_desc_size: int = len(HID_MOUSE_REPORT_DESC) # 16
     report_desc: bytes = HID_MOUSE_REPORT_DESC
+    payload: bytes = _serialize_uhid_create(HID_ID_MOUSE, HID_MOUSE_REPORT_DESC)
+
     def serialize(self) -> bytes:
-        buf = struct.pack(
-            ">BHBH",
-            self.msg_type.value,
-            self.id_,
-            self.name,
-            self.report_desc_size,
-        )
-        buf += self.report_desc
-        return buf
+        return self.payload
 
 class HIDMouseInputEvent:
+    __slots__ = ("buttons", "x", "y", "wheel")
     msg_type: ControlMsgType = ControlMsgType.MSG_TYPE_UHID_INPUT # 8
     id_: int = HID_ID_MOUSE # 16
     size: int = HID_MOUSE_INPUT_SIZE # 16
 
-    def __init__(self, data: list[int]) -> None:
-        self.data = bytes(data)
+    def __init__(self, buttons: int, x: int, y: int, wheel: int) -> None:
+        # `x`, `y` and `wheel` must be in range [-127, 127]
+        self.buttons = buttons
+        self.x = x
+        self.y = y
+        self.wheel = wheel
 
     def serialize(self) -> bytes:
-        buf = struct.pack(
-            ">BHH",
-            self.msg_type.value,
-            self.id_,
-            self.size,
-        )
-        buf += self.data
-        return buf
+        return UHID_MOUSE_INPUT.pack(
+            MSG_TYPE_UHID_INPUT, HID_ID_MOUSE, HID_MOUSE_INPUT_SIZE,
+            self.buttons, self.x, self.y, self.wheel)
 
 def MouseMoveEvent(x: int, y: int, buttons_state: MouseButtonStateStore) -> HIDMouseInputEvent:
-    data = [0, 0, 0, 0]
-    data[0] = buttons_state.mouse_button
-    data[1] = clamp(x, -127, 127) % 256
-    data[2] = clamp(y, -127, 127) % 256
-    data[3] = 0
-    input_event = HIDMouseInputEvent(data)
-    return input_event
+    # most deltas are small, only call `clamp` for the large ones
+    if not HID_AXIS_MIN <= x <= HID_AXIS_MAX: x = clamp(x, HID_AXIS_MIN, HID_AXIS_MAX)
+    if not HID_AXIS_MIN <= y <= HID_AXIS_MAX: y = clamp(y, HID_AXIS_MIN, HID_AXIS_MAX)
+    return HIDMouseInputEvent(buttons_state.mouse_button, x, y, 0)
 
 def MouseClickEvent(buttons_state: MouseButtonStateStore) -> HIDMouseInputEvent:
-    data = [0, 0, 0, 0]
-    data[0] = buttons_state.mouse_button
-    input_event = HIDMouseInputEvent(data)
-    return input_event
+    return HIDMouseInputEvent(buttons_state.mouse_button, 0, 0, 0)
 
 def MouseScrollEvent(dy: int) -> HIDMouseInputEvent:
-    data = [0, 0, 0, 0]
-    data[3] = clamp(dy, -127, 127) % 256
-    input_event = HIDMouseInputEvent(data)
-    return input_event
+    return HIDMouseInputEvent(0, 0, 0, clamp(dy, HID_AXIS_MIN, HID_AXIS_MAX))
@@ -1,10 +1,22 @@
 import struct
+from functools import lru_cache
 from pynput.mouse import Button
 
 from scrcpy_client import ControlMsgType
 from scrcpy_client.android_def import POINTER_ID_MOUSE, AKeyCode, AKeyEventAction, AMotionEventAction, AMotionEventButtons, ScreenPosition
 
+MSG_TYPE_INJECT_KEYCODE = ControlMsgType.MSG_TYPE_INJECT_KEYCODE.value
+# type (8) + action (8) + key code (32) + repeat (32) + metastate (32)
+INJECT_KEYCODE = struct.Struct(">BBIII")
+
+@lru_cache(maxsize=None)
+def _serialize_inject_keycode(key_code: int, action: int) -> bytes:
+    # `repeat` and `metastate` are always 0, so the payload only depends on
+    # the key code and the action and there are few enough of them to be cached
+    return INJECT_KEYCODE.pack(MSG_TYPE_INJECT_KEYCODE, action, key_code, 0, 0)
+
 class InjectKeyCode:
+    __slots__ = ("key_code", "action")
     msg_type: ControlMsgType = ControlMsgType.MSG_TYPE_INJECT_KEYCODE
     repeat: int = 0
     metastate: int = 0
@@ -14,15 +26,12 @@ class InjectKeyCode:
         self.action = action
 
     def serialize(self) -> bytes:
-        buf = struct.pack(
-            ">BBIII",
-            self.msg_type.value,
-            self.action.value,
-            self.key_code.value,
-            self.repeat,
-            self.metastate,
-        )
-        return buf
+        return _serialize_inject_keycode(self.key_code, self.action)
+
+WAKEUP_KEY_EVENTS = (
+    InjectKeyCode(AKeyCode.AKEYCODE_WAKEUP, AKeyEventAction.AKEY_EVENT_ACTION_DOWN).serialize(),
+    InjectKeyCode(AKeyCode.AKEYCODE_WAKEUP, AKeyEventAction.AKEY_EVENT_ACTION_UP).serialize(),
+)
 
 class InjectTouchEvent:
     msg_type: ControlMsgType = ControlMsgType.MSG_TYPE_INJECT_TOUCH_EVENT
@@ -1,35 +1,55 @@
 import socket
-import subprocess
+
+from adbutils import AdbDevice
 from server import scrcpy_receiver, reporter_receiver
-from utils.adb_controller import get_adb_device
+from utils.adb_session import get_adb_session
+from utils.deploy_cache import ensure_forward, get_deploy_cache
 from utils.logger import LOGGER, LogType
 
-def deploy_scrcpy_server() -> tuple[subprocess.Popen, socket.socket] | Exception:
-    primary_device = get_adb_device()
-    if isinstance(primary_device, Exception): return primary_device
-
+def deploy_scrcpy_server(primary_device: AdbDevice) -> tuple[scrcpy_receiver.ServerProcess, socket.socket] | Exception:
     scrcpy_receiver.push_server(primary_device)
-    primary_device.forward(f"tcp:{scrcpy_receiver.SERVER_PORT}", "localabstract:scrcpy")
+    ensure_forward(primary_device, f"tcp:{scrcpy_receiver.server_port()}", "localabstract:scrcpy")
 
-    server_process = scrcpy_receiver.server_process_factory()
+    server_process = scrcpy_receiver.server_process_factory(primary_device)
     if isinstance(server_process, Exception):
         return server_process
 
-    client_socket = scrcpy_receiver.try_connect_server("localhost")
+    if (res := server_process.wait_ready()) is not None:
+        server_process.terminate()
+        return res
+
+    client_socket = scrcpy_receiver.try_connect_server("localhost", started_at=server_process.started_at)
     if isinstance(client_socket, Exception):
+        server_process.terminate()
         return client_socket
 
     return server_process, client_socket
 
-def deploy_reporter_server() -> Exception | None:
-    primary_device = get_adb_device()
-    if isinstance(primary_device, Exception): return primary_device
-    primary_device.forward(f"tcp:{reporter_receiver.SERVER_PORT}", f"tcp:{reporter_receiver.SERVER_PORT}")
+def probe_reporter_server(primary_device: AdbDevice) -> tuple[str, str, bool]:
+    # the package path, the installed version and whether it is running, in one shell round-trip
+    package_name = reporter_receiver.PACKAGE_NAME
+    package_path, package_version, pid = get_adb_session(primary_device).shell_batch([
+        f"pm path {package_name}",
+        f"dumpsys package {package_name} | grep versionName",
+        f"pidof {package_name}",
+    ])
+    version_lines = package_version.splitlines()
+    parsed_version = version_lines[0].split("=")[-1].strip() if len(version_lines) > 0 else ""
+    return package_path, parsed_version, len(pid) > 0
+
+def deploy_reporter_server(primary_device: AdbDevice) -> Exception | None:
+    ensure_forward(primary_device, f"tcp:{reporter_receiver.server_port()}", f"tcp:{reporter_receiver.SERVER_DEVICE_PORT}")
+
+    deploy_cache = get_deploy_cache()
+    if deploy_cache.get(primary_device.serial).reporter_version == reporter_receiver.PACKAGE_VERSION:
+        # installed by a previous run, starting it is the check
+        res = reporter_receiver.start_server(primary_device, None)
+        if not isinstance(res, reporter_receiver.ReporterStartException):
+            LOGGER.write(LogType.Server, "Reporter started with the cached deploy state.")
+            return res
+        deploy_cache.update(primary_device.serial, reporter_version="")
 
-    package_path    = primary_device.shell("pm path " + reporter_receiver.PACKAGE_NAME)
-    package_version = primary_device.shell(f"dumpsys package {reporter_receiver.PACKAGE_NAME} | grep versionName")
-    assert type(package_path) == str and type(package_version) == str
-    parsed_version = package_version.split("=")[1] if package_version else ""
+    package_path, parsed_version, is_running = probe_reporter_server(primary_device)
     not_installed  = len(package_path) == 0
     is_outdated    = parsed_version != reporter_receiver.PACKAGE_VERSION
     if not_installed or is_outdated:
@@ -37,5 +57,8 @@ def deploy_reporter_server() -> Exception | None:
         elif is_outdated: LOGGER.write(LogType.Server, "Reporter outdated, updating...")
         if (res := reporter_receiver.install_server(primary_device)) is not None:
             return res
+        is_running = False
 
-    return reporter_receiver.start_server(primary_device)
+    res = reporter_receiver.start_server(primary_device, is_running)
+    if res is None: deploy_cache.update(primary_device.serial, reporter_version=reporter_receiver.PACKAGE_VERSION)
+    return res
@@ -5,16 +5,24 @@ from pathlib import Path
 
 from adbutils import AdbDevice
 from utils import DevicePosition, VoidCallable, script_abs_path
+from utils.adb_session import get_adb_session
 from utils.logger import LOGGER, LogType
 from utils.network import get_port
+from utils.tracing import TRACER
 
 PACKAGE_NAME = "com.bhznjns.inputsharereporter"
 PACKAGE_VERSION = "1.1.0"
 ENTRY_ACTIVITY_NAME = ".MainActivity"
 SERVER_EXECUTABLE_NAME = "reporter.apk"
-SERVER_PORT = get_port("reporter_port", 61625)
+SERVER_DEVICE_PORT = 61625
 SERVER_RETRY_INTERVAL = 2
 
+def server_port() -> int:
+    # resolved on first use, finding a free port binds sockets
+    return get_port("reporter_port", SERVER_DEVICE_PORT)
+
+class ReporterStartException(Exception): pass
+
 SERVER_EVENT_KEEPALIVE = 0x00
 SERVER_EVENT_TOGGLE    = 0x01
 SERVER_EVENT_EDGE_TOGGLING_PAUSE  = 0x02
@@ -35,22 +43,25 @@ def install_server(device: AdbDevice) -> Exception | None:
         unreachable()
         return e
 
-def start_server(device: AdbDevice) -> Exception | None:
+def start_server(device: AdbDevice, is_server_running: bool | None) -> Exception | None:
+    # `is_server_running` is None when it was not probed
     from adbutils import AdbTimeout
     from utils.config_manager import get_config
 
     try:
-        is_server_running = device.shell(f"pidof {PACKAGE_NAME}")
-        assert type(is_server_running) == str
-        if len(is_server_running) > 0: LOGGER.write(LogType.Server, "Reporter server is already running.")
-        else: LOGGER.write(LogType.Server, "Reporter server is not running, try to start...")
+        if is_server_running is True: LOGGER.write(LogType.Server, "Reporter server is already running.")
+        elif is_server_running is False: LOGGER.write(LogType.Server, "Reporter server is not running, try to start...")
 
         config_position = get_config().device_position
         param_direction = DevicePosition.parse(config_position)
-        device.shell(f"am start -n {PACKAGE_NAME}/{PACKAGE_NAME + ENTRY_ACTIVITY_NAME} -e \"direction\" \"{param_direction}\"")
+        output = get_adb_session(device).shell(f"am start -n {PACKAGE_NAME}/{PACKAGE_NAME + ENTRY_ACTIVITY_NAME} -e \"direction\" \"{param_direction}\"")
     except AdbTimeout as e:
         LOGGER.write(LogType.Server, "Start reporter server timeout.")
         return e
+    # e.g. "Error: Activity class {...} does not exist." when the app is not installed
+    if "Error" in output:
+        LOGGER.write(LogType.Server, "Start reporter server failed: " + output)
+        return ReporterStartException(output)
 
 def server_receiver_factory() -> VoidCallable:
     from input.controller import schedule_toggle as main_schedule_toggle
@@ -79,7 +90,8 @@ def server_receiver_factory() -> VoidCallable:
         while not client_stop_event.is_set():
             client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             try:
-                client_socket.connect(("localhost", SERVER_PORT))
+                with TRACER.span("reporter connect"):
+                    client_socket.connect(("localhost", server_port()))
                 LOGGER.write(LogType.Server, "Reporter connected.")
                 connected = True
             except ConnectionRefusedError:
@@ -101,6 +113,7 @@ def server_receiver_factory() -> VoidCallable:
             client_socket.close()
             time.sleep(SERVER_RETRY_INTERVAL)
             LOGGER.write(LogType.Server, "Reporter retry connection.")
+            TRACER.instant("reporter reconnect")
 
         LOGGER.write(LogType.Server, "Reporter receiver stopped.")
 
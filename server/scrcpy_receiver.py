@@ -1,98 +1,227 @@
+import functools
+import hashlib
+import os
 import socket
 import threading
-import socket
-import subprocess
 import time
 
 from pathlib import Path
-from adbutils import AdbDevice
-from scrcpy_client.clipboard_event import GetClipboardEventResponse
+from adbutils import AdbConnection, AdbDevice
+from scrcpy_client.device_msg import AckClipboardMsg, ClipboardMsg, DeviceMsgParser, UhidOutputMsg
 from utils import script_abs_path, VoidCallable
-from utils.adb_controller import ADB_BIN_PATH, ADB_SERVER_PORT, get_adb_device
-from utils.clipboard import Clipboard
+from utils.adb_session import get_adb_session
+from utils.clipboard import CLIPBOARD_STATE, Clipboard
+from utils.deploy_cache import get_deploy_cache
 from utils.logger import LOGGER, LogType
 from utils.network import get_port
+from utils.tracing import TRACER, traced
 
-SERVER_PORT = get_port("scrcpy_port", 1234)
 SERVER_EXECUTABLE_NAME = "scrcpy-server"
+# control messages are tiny, bigger buffers only help the clipboard transfers
+SOCKET_SEND_BUFFER_SIZE = 256 * 1024
+SOCKET_RECV_BUFFER_SIZE = 256 * 1024
+
+def server_port() -> int:
+    # resolved on first use, finding a free port binds sockets
+    return get_port("scrcpy_port", 1234)
 
 class InvalidDummyByteException(Exception): pass
 
+SERVER_TARGET_PATH = "/data/local/tmp/scrcpy-server-manual.jar"
+
+@functools.cache
+def local_file_digest(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(64 * 1024): sha256.update(chunk)
+    return sha256.hexdigest()
+
+def remote_server_mtime(device: AdbDevice) -> int:
+    # 0 when the file is missing
+    return int(device.sync.stat(SERVER_TARGET_PATH).mtime.timestamp())
+
+def is_server_up_to_date(device: AdbDevice, local_path: str, digest: str) -> tuple[bool, int]:
+    # returns whether the pushed server matches `digest`, and its remote mtime
+    try:
+        remote_info = device.sync.stat(SERVER_TARGET_PATH)
+        remote_mtime = int(remote_info.mtime.timestamp())
+        # missing file reports size 0, a different size is enough to tell
+        if remote_info.size != os.path.getsize(local_path): return False, remote_mtime
+        # the path is shared with other scrcpy based tools, the cached digest is only
+        # trusted while the file is still the one pushed by us, same size and mtime
+        deploy_state = get_deploy_cache().get(device.serial)
+        if deploy_state.server_digest == digest and\
+           deploy_state.server_mtime == remote_mtime != 0: return True, remote_mtime
+        output = get_adb_session(device).shell(f"sha256sum {SERVER_TARGET_PATH} 2>/dev/null")
+    except Exception as e:
+        LOGGER.write(LogType.Adb, "Checking pushed server failed: " + str(e))
+        return False, 0
+    # old devices without `sha256sum` print nothing
+    remote_digest = output.split()[0] if len(output) > 0 else None
+    return remote_digest == digest, remote_mtime
+
+@traced("push_server")
 def push_server(device: AdbDevice):
-    target_path = "/data/local/tmp/scrcpy-server-manual.jar"
     script_path = script_abs_path(__file__)
-    server_binary_path = Path.joinpath(script_path, SERVER_EXECUTABLE_NAME)
-    device.sync.push(str(server_binary_path), target_path)
-
-def server_process_factory() -> subprocess.Popen | Exception:
-    INSTALL_SCRCPY_SERVER_COMMAND = "CLASSPATH=/data/local/tmp/scrcpy-server-manual.jar \
+    server_binary_path = str(Path.joinpath(script_path, SERVER_EXECUTABLE_NAME))
+    deploy_cache = get_deploy_cache()
+    start_time = time.perf_counter()
+    digest = local_file_digest(server_binary_path)
+    is_up_to_date, remote_mtime = is_server_up_to_date(device, server_binary_path, digest)
+    if is_up_to_date:
+        check_duration = time.perf_counter() - start_time
+        message = f"Scrcpy server up to date, push skipped, checked in {check_duration * 1000:.1f} ms"
+        if (push_duration := deploy_cache.get(device.serial).server_push_duration) > 0:
+            message += f", saved {(push_duration - check_duration) * 1000:.1f} ms"
+        LOGGER.write(LogType.Adb, message + ".")
+        deploy_cache.update(device.serial, server_digest=digest, server_mtime=remote_mtime)
+    else:
+        push_start_time = time.perf_counter()
+        device.sync.push(server_binary_path, SERVER_TARGET_PATH)
+        push_duration = time.perf_counter() - push_start_time
+        LOGGER.write(LogType.Adb, f"Scrcpy server pushed in {push_duration * 1000:.1f} ms.")
+        try: remote_mtime = remote_server_mtime(device)
+        except Exception: remote_mtime = 0 # the cache is not trusted on the next run
+        deploy_cache.update(device.serial, server_digest=digest,
+                            server_mtime=remote_mtime, server_push_duration=push_duration)
+
+# printed by the server once it is about to listen for the connection
+SERVER_READY_MARKER = "Device:"
+SERVER_READY_TIMEOUT_SEC = 10
+CONNECT_RETRY_INITIAL_SEC = 0.02
+CONNECT_RETRY_MAX_SEC = 0.5
+CONNECT_TIMEOUT_SEC = 10
+
+class ServerProcess:
+    """
+    The `app_process` running the scrcpy server, in an ADB shell stream
+    of this process, its output is read and logged by a background thread.
+    """
+    def __init__(self, connection: AdbConnection) -> None:
+        self.connection = connection
+        self.started_at = time.perf_counter()
+        self.ready_event = threading.Event()
+        self.is_ready = False
+        threading.Thread(target=self.__read_output, daemon=True).start()
+
+    def __read_output(self):
+        # the stdout and stderr of a shell stream are merged
+        # the socket is only really closed once its file object is closed too
+        try:
+            with self.connection.conn.makefile("r", encoding="utf-8", errors="replace") as output:
+                for line in output:
+                    LOGGER.write(LogType.Server, line.rstrip())
+                    if SERVER_READY_MARKER in line and not self.is_ready:
+                        self.is_ready = True
+                        elapsed_ms = (time.perf_counter() - self.started_at) * 1000
+                        LOGGER.write(LogType.Server, f"Scrcpy server ready in {elapsed_ms:.1f} ms.")
+                        self.ready_event.set()
+        except (OSError, ValueError): pass # closed by `terminate`
+        # the server exited, the waiters should not wait for the timeout
+        self.ready_event.set()
+
+    def wait_ready(self, timeout: float=SERVER_READY_TIMEOUT_SEC) -> Exception | None:
+        with TRACER.span("wait_server_ready"):
+            is_set = self.ready_event.wait(timeout)
+        if not is_set:
+            return TimeoutError("Scrcpy server not ready")
+        if not self.is_ready:
+            return ChildProcessError("Scrcpy server exited")
+
+    def terminate(self):
+        # closing the shell stream ends the server on the device,
+        # the shutdown wakes the reader up, which closes the file object
+        try: self.connection.conn.shutdown(socket.SHUT_RDWR)
+        except OSError: pass
+        self.connection.close()
+
+@traced("server_process_factory")
+def server_process_factory(primary_device: AdbDevice) -> ServerProcess | Exception:
+    INSTALL_SCRCPY_SERVER_COMMAND = f"CLASSPATH={SERVER_TARGET_PATH} \
 app_process / com.genymobile.scrcpy.Server 2.7 \
 tunnel_forward=true video=false audio=false control=true \
 cleanup=false raw_stream=true send_dummy_byte=true max_size=4096"
-    primary_device = get_adb_device()
-    if isinstance(primary_device, Exception): return primary_device
     try:
-        process = subprocess.Popen(
-            f"{ADB_BIN_PATH} -s {primary_device.serial} -P {ADB_SERVER_PORT} shell {INSTALL_SCRCPY_SERVER_COMMAND}",
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            creationflags=subprocess.CREATE_NO_WINDOW,
-        )
-        output = process.stdout.readline() # type: ignore
+        connection = get_adb_session(primary_device).shell_stream(INSTALL_SCRCPY_SERVER_COMMAND)
     except Exception as e:
-        LOGGER.write(LogType.Error, "Failed to start subprocess: " + str(e))
+        LOGGER.write(LogType.Error, "Failed to start scrcpy server shell: " + str(e))
         return e
-    LOGGER.write(LogType.Server, output)
-    time.sleep(1)
-    return process
-
-def try_connect_server(host: str, port: int=SERVER_PORT) -> socket.socket | Exception:
-    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    client_socket.connect((host, port))
-
-    client_socket.settimeout(3)
-    try:
-        dummy = client_socket.recv(4)
-        client_socket.settimeout(None)
-    except socket.timeout as e: return e
-    except Exception as e: return e
+    return ServerProcess(connection)
+
+def tune_socket(client_socket: socket.socket):
+    # disable Nagle's algorithm, coalescing is done by the `ControlSender`
+    client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_SEND_BUFFER_SIZE)
+    client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RECV_BUFFER_SIZE)
+
+@traced("try_connect_server")
+def try_connect_server(
+    host: str,
+    port: int | None = None,
+    started_at: float | None = None,
+    timeout: float=CONNECT_TIMEOUT_SEC,
+) -> socket.socket | Exception:
+    """
+    Connects and reads the dummy byte, retrying with exponential backoff until `timeout`.
+    Through `adb forward` the connection is accepted even when the server is not
+    listening yet, and closed right away, so an empty read is retried too.
+    `started_at` is the `time.perf_counter()` of the server start, for the startup metric.
+    """
+    if port is None: port = server_port()
+    deadline = time.perf_counter() + timeout
+    retry_interval = CONNECT_RETRY_INITIAL_SEC
+    attempt_count = 0
+    last_error: Exception = TimeoutError("Scrcpy server connecting timeout")
+    while True:
+        attempt_count += 1
+        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        tune_socket(client_socket)
+        client_socket.settimeout(max(deadline - time.perf_counter(), 0.01))
+        try:
+            client_socket.connect((host, port))
+            dummy = client_socket.recv(1)
+        except socket.timeout as e:
+            client_socket.close(); return e
+        except OSError as e:
+            dummy, last_error = b"", e
+
+        if len(dummy) > 0:
+            client_socket.settimeout(None)
+            if dummy[0] != 0x00:
+                client_socket.close()
+                return InvalidDummyByteException()
+            message = f"Dummy byte received after {attempt_count} attempts"
+            if started_at is not None:
+                message += f", {(time.perf_counter() - started_at) * 1000:.1f} ms after server start"
+            LOGGER.write(LogType.Info, message + ".")
+            return client_socket
 
-    LOGGER.write(LogType.Info, "dummy byte: " + str(dummy))
-    if len(dummy) == 1 and dummy[0] == 0x00:
-        return client_socket
-    return InvalidDummyByteException()
+        client_socket.close()
+        if time.perf_counter() + retry_interval > deadline:
+            LOGGER.write(LogType.Error, f"Scrcpy server connecting failed after {attempt_count} attempts.")
+            return last_error
+        time.sleep(retry_interval)
+        retry_interval = min(retry_interval * 2, CONNECT_RETRY_MAX_SEC)
 
 # --- --- --- --- --- ---
 
-class ReceivedClipboardText:
-    lock = threading.Lock()
-    text: str | None = None
-    @staticmethod
-    def read():
-        with ReceivedClipboardText.lock:
-            current_text = ReceivedClipboardText.text
-        return current_text
-    @staticmethod
-    def write(new_text: str):
-        with ReceivedClipboardText.lock:
-            ReceivedClipboardText.text = new_text
-
 def server_receiver_factory(client_socket: socket.socket) -> VoidCallable:
     from utils.config_manager import get_config
 
+    def on_clipboard(text: str):
+        if not get_config().sync_clipboard: return
+        # the echoes of the contents sent from here are dropped without touching the clipboard
+        if CLIPBOARD_STATE.should_apply(text):
+            Clipboard.safe_copy(text)
+
     def data_recv(client_socket: socket.socket) -> bool:
-        data = client_socket.recv(4096)
-        if len(data) > 0:
-            text = GetClipboardEventResponse.deserialize(data)
-            if text is None: return True
-
-            # prevent duplicated clipboard content
-            current_clipboard_text = Clipboard.safe_paste()
-            if not get_config().sync_clipboard: return True
-            if current_clipboard_text is not None and text != current_clipboard_text:
-                Clipboard.safe_copy(text)
-                ReceivedClipboardText.write(text)
+        received_size = client_socket.recv_into(parser.writable())
+        if received_size > 0:
+            parser.commit(received_size)
+            for msg in parser.messages():
+                match msg:
+                    case ClipboardMsg(text=text): on_clipboard(text)
+                    case AckClipboardMsg() | UhidOutputMsg(): pass
             return True
         else:
             LOGGER.write(LogType.Server, "Scrcpy server closed connection.")
@@ -114,7 +243,9 @@ def server_receiver_factory(client_socket: socket.socket) -> VoidCallable:
         nonlocal client_socket, thread
         client_socket.close()
         thread.join()
+        LOGGER.write(LogType.Info, "Clipboard sync: " + CLIPBOARD_STATE.summary())
 
+    parser = DeviceMsgParser()
     thread = threading.Thread(target=receiver, args=[client_socket])
     thread.start()
     return stop_receiver
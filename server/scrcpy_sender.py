@@ -0,0 +1,231 @@
+import socket
+import threading
+import time
+
+from collections import Counter, deque
+from typing import Callable
+from utils.logger import LOGGER, LogType
+from utils.precise_timer import COARSE_TIMER_RESOLUTION_SEC, IS_TIMER_COARSE
+
+SendErrorCallback = Callable[[Exception], None]
+
+# Windows sockets have no `sendmsg`
+HAS_SENDMSG = hasattr(socket.socket, "sendmsg")
+
+def send_vectored(client_socket: socket.socket, buffers: list[bytes]):
+    if len(buffers) == 1:
+        client_socket.sendall(buffers[0]); return
+    if not HAS_SENDMSG:
+        client_socket.sendall(b"".join(buffers)); return
+
+    views = [memoryview(buf) for buf in buffers]
+    while len(views) > 0:
+        sent = client_socket.sendmsg(views)
+        # drop the buffers written completely, and trim the partially written one
+        while sent > 0:
+            first_len = len(views[0])
+            if sent < first_len:
+                views[0] = views[0][sent:]
+                break
+            sent -= first_len
+            views.pop(0)
+
+class LatencyStats:
+    MAX_SAMPLES = 4096
+
+    def __init__(self) -> None:
+        self.samples: deque[float] = deque(maxlen=LatencyStats.MAX_SAMPLES)
+
+    def record(self, latency_sec: float):
+        self.samples.append(latency_sec)
+
+    def summary(self) -> str:
+        samples = sorted(self.samples)
+        if len(samples) == 0: return "no samples"
+        def percentile(p: float) -> float:
+            return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+        return f"p50 {percentile(0.5):.2f} ms, p99 {percentile(0.99):.2f} ms, " +\
+               f"max {samples[-1] * 1000:.2f} ms over {len(samples)} messages"
+
+class ControlSender:
+    """
+    The only writer of the scrcpy control socket.
+
+    Messages go through one of two lanes:
+    - the realtime lane (HID reports, key codes) is always written first,
+      messages queued within `flush_window_sec` are coalesced into one vectored write,
+      no window is used where it would be rounded up to a timer tick;
+    - the bulk lane (clipboard payloads) is written only when the realtime lane is empty.
+    Messages of the same lane are written in the order they were queued.
+    The scrcpy messages can not be interleaved, a realtime message queued while
+    a bulk message is written waits for the end of it; the clipboard texts are
+    limited to `CLIPBOARD_TEXT_MAX_LENGTH`, which bounds that wait.
+    """
+    DEFAULT_QUEUE_SIZE = 256
+    DEFAULT_BULK_QUEUE_SIZE = 4
+    DEFAULT_FLUSH_WINDOW_SEC = 0.0005
+    MAX_FLUSH_MESSAGES = 64
+    # when the queue depth reaches this value, producers that can merge or
+    # drop their data (e.g. mouse motion) should hold it back
+    CONGESTION_THRESHOLD = 32
+
+    def __init__(
+        self,
+        client_socket: socket.socket,
+        queue_size: int=DEFAULT_QUEUE_SIZE,
+        flush_window_sec: float=DEFAULT_FLUSH_WINDOW_SEC,
+    ) -> None:
+        self.client_socket = client_socket
+        self.queue_size = queue_size
+        self.flush_window_sec = max(0, flush_window_sec)
+        if IS_TIMER_COARSE and self.flush_window_sec < COARSE_TIMER_RESOLUTION_SEC:
+            # the wait would last a whole timer tick, coalescing is not worth it
+            self.flush_window_sec = 0
+        # messages per flush -> flush count
+        self.flush_sizes: Counter[int] = Counter()
+        # from queuing to written, for realtime messages
+        self.realtime_latency = LatencyStats()
+        self.realtime_latency_during_bulk = LatencyStats()
+
+        self.__condition = threading.Condition()
+        self.__realtime: deque[tuple[bytes, float]] = deque()
+        self.__bulk: deque[bytes] = deque()
+        self.__is_bulk_writing = False
+        self.__last_bulk_span = (0.0, 0.0)
+        self.__is_stopping = False
+        self.__error: Exception | None = None
+        self.__on_error: SendErrorCallback | None = None
+        self.__error_reported = threading.Event()
+        self.__thread: threading.Thread | None = None
+
+    def start(self, on_error: SendErrorCallback | None = None):
+        self.__on_error = on_error
+        self.__thread = threading.Thread(target=self.__writer, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        if self.__thread is None: return
+        # pending messages are flushed before the writer exits
+        with self.__condition:
+            self.__is_stopping = True
+            self.__condition.notify_all()
+        self.__thread.join(timeout=1)
+        self.__thread = None
+        LOGGER.write(LogType.Info, "Control sender flushes: " + self.flush_summary())
+        LOGGER.write(LogType.Info, "Realtime message latency: " + self.realtime_latency.summary())
+        LOGGER.write(LogType.Info, "Realtime message latency during bulk writes: " +
+                                   self.realtime_latency_during_bulk.summary())
+
+    def send(self, data: bytes) -> Exception | None:
+        """
+        Queues `data` into the realtime lane, blocking while the lane is full.
+        Returns the error that stopped the writer, if any.
+        """
+        with self.__condition:
+            while self.__error is None and len(self.__realtime) >= self.queue_size:
+                self.__condition.wait()
+            if self.__error is not None: return self.__error
+            self.__realtime.append((data, time.perf_counter()))
+            self.__condition.notify_all()
+        return None
+
+    def send_bulk(self, data: bytes) -> Exception | None:
+        """
+        Queues `data` into the bulk lane, blocking while the lane is full.
+        Returns the error that stopped the writer, if any.
+        """
+        with self.__condition:
+            while self.__error is None and len(self.__bulk) >= ControlSender.DEFAULT_BULK_QUEUE_SIZE:
+                self.__condition.wait()
+            if self.__error is not None: return self.__error
+            self.__bulk.append(data)
+            self.__condition.notify_all()
+        return None
+
+    @property
+    def error(self) -> Exception | None:
+        return self.__error
+
+    def depth(self) -> int:
+        return len(self.__realtime)
+
+    def is_congested(self) -> bool:
+        # while a bulk message is being written, the realtime messages can only wait behind it
+        return self.__is_bulk_writing or self.depth() >= ControlSender.CONGESTION_THRESHOLD
+
+    def flush_summary(self) -> str:
+        flush_count = sum(self.flush_sizes.values())
+        if flush_count == 0: return "none"
+        message_count = sum(size * count for size, count in self.flush_sizes.items())
+        histogram = ", ".join(f"{size}: {count}" for size, count in sorted(self.flush_sizes.items()))
+        return f"{message_count} messages in {flush_count} flushes " +\
+               f"(avg {message_count / flush_count:.2f}, max {max(self.flush_sizes)}), " +\
+               f"messages per flush -> flushes: {{{histogram}}}"
+
+    def __report_error(self, e: Exception):
+        with self.__condition:
+            self.__error = e
+            self.__realtime.clear()
+            self.__bulk.clear()
+            # wake up the blocked producers
+            self.__condition.notify_all()
+        if self.__error_reported.is_set(): return
+        self.__error_reported.set()
+        LOGGER.write(LogType.Error, "Send data error: " + str(e))
+        if self.__on_error is not None: self.__on_error(e)
+
+    def __take_realtime(self) -> list[tuple[bytes, float]]:
+        # called with the lock held and the realtime lane not empty
+        if self.flush_window_sec > 0 and len(self.__realtime) == 1:
+            # the producers queue meanwhile, the wait ends early once a batch is full
+            deadline = time.perf_counter() + self.flush_window_sec
+            while not self.__is_stopping and len(self.__realtime) < ControlSender.MAX_FLUSH_MESSAGES:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0: break
+                self.__condition.wait(remaining)
+        batch: list[tuple[bytes, float]] = []
+        while len(self.__realtime) > 0 and len(batch) < ControlSender.MAX_FLUSH_MESSAGES:
+            batch.append(self.__realtime.popleft())
+        self.__condition.notify_all()
+        return batch
+
+    def __write_realtime(self, batch: list[tuple[bytes, float]]):
+        send_vectored(self.client_socket, [data for data, _ in batch])
+        self.flush_sizes[len(batch)] += 1
+        current_time = time.perf_counter()
+        bulk_start, bulk_end = self.__last_bulk_span
+        for _, queued_time in batch:
+            is_during_bulk = bulk_start <= queued_time <= bulk_end
+            stats = self.realtime_latency_during_bulk if is_during_bulk else self.realtime_latency
+            stats.record(current_time - queued_time)
+
+    def __write_bulk(self, data: bytes):
+        # the realtime messages queued meanwhile are written right after it
+        start_time = time.perf_counter()
+        self.client_socket.sendall(data)
+        self.__last_bulk_span = (start_time, time.perf_counter())
+
+    def __writer(self):
+        while True:
+            with self.__condition:
+                while len(self.__realtime) == 0 and len(self.__bulk) == 0 and not self.__is_stopping:
+                    self.__condition.wait()
+                if len(self.__realtime) > 0:
+                    realtime_batch, bulk_data = self.__take_realtime(), None
+                elif len(self.__bulk) > 0:
+                    realtime_batch, bulk_data = None, self.__bulk.popleft()
+                    self.__is_bulk_writing = True
+                    self.__condition.notify_all()
+                else: break # stopping and all the messages are flushed
+
+            try:
+                if realtime_batch is not None:
+                    self.__write_realtime(realtime_batch)
+                elif bulk_data is not None:
+                    self.__write_bulk(bulk_data)
+            except Exception as e:
+                self.__report_error(e)
+                break
+            finally:
+                self.__is_bulk_writing = False
+        LOGGER.write(LogType.Info, "Control sender stopped.")
@@ -5,16 +5,32 @@ import customtkinter as ctk
 from dataclasses import dataclass
 from queue import Queue
 from ui import ICON_ICO_PATH
-from utils.adb_controller import get_adb_client, try_connect_device, try_pairing
+from utils.adb_controller import get_adb_client, race_connect_devices, try_connect_device, try_pairing
 from utils.config_manager import get_config, get_config_manager
 from utils.logger import LOGGER, LogType, unreachable
-from utils.network import get_ip_from_ip_port, is_valid_ip, is_valid_ip_port, scan_port
+from utils.network import get_ip_from_ip_port, is_valid_ip, is_valid_ip_port, iter_open_ports,\
+                          AdbProbeResult, probe_adb, rank_adb_ports,\
+                          ADB_CONNECT_SERVICE, ADB_PAIRING_SERVICE, AdbService, get_mdns_discovery,\
+                          center_out_ports, recent_ports, remember_port
 from utils.i18n import get_i18n
+from utils.profiling import STARTUP_PROFILER
+from utils.timeline import STARTUP_TIMELINE
 
 i18n = get_i18n()
 is_wired_connection = False
-
-def mount_pairing_view(tabview: ctk.CTkTabview, connecting_addr_entry: ctk.CTkEntry):
+DISCOVERY_POLL_INTERVAL_MS = 500
+
+def autofill_entry(entry: ctk.CTkEntry, service: AdbService):
+    # only an empty entry, or one with the IP of the service, is filled
+    if entry.cget("state") == "disabled": return
+    current = entry.get().strip()
+    if current == service.address: return
+    if current == "" or current == service.ip or\
+       (is_valid_ip_port(current) and get_ip_from_ip_port(current).strip("[]") == service.ip):
+        entry.delete(0, ctk.END)
+        entry.insert(0, service.address)
+
+def mount_pairing_view(tabview: ctk.CTkTabview, connecting_addr_entry: ctk.CTkEntry) -> ctk.CTkEntry:
     def pair_callback():
         global connecting_window
         nonlocal addr_entry, pairing_code_entry, error_label
@@ -91,6 +107,7 @@ def mount_pairing_view(tabview: ctk.CTkTabview, connecting_addr_entry: ctk.CTkEn
     button_frame.grid(row=6, column=0, padx=20, pady=10, sticky="we")
     skip_button.pack(side=ctk.LEFT)
     pair_button.pack(side=ctk.RIGHT)
+    return addr_entry
 
 def mount_connecting_view(tabview: ctk.CTkTabview) -> ctk.CTkEntry:
     @dataclass
@@ -111,14 +128,41 @@ def mount_connecting_view(tabview: ctk.CTkTabview) -> ctk.CTkEntry:
         # format address string into ip_part only string
         ip_addr_part = addr if valid_ip else get_ip_from_ip_port(addr)
 
-        target_ports = scan_port(ip_addr_part)
-        for port in target_ports:
-            connect_addr = f"{ip_addr_part}:{port}"
-            ret = try_connect_device(connect_addr)
-            if ret is not None:
-                process_data_queue.put(ProcessOk(connect_addr))
-                return
-        LOGGER.write(LogType.Error, "Scanned ports: " + str(target_ports))
+        def on_connected(port: int):
+            remember_port(ip_addr_part, port)
+            process_data_queue.put(ProcessOk(f"{ip_addr_part}:{port}"))
+
+        def try_connect_port(port: int) -> bool:
+            tried_ports.add(port)
+            if try_connect_device(f"{ip_addr_part}:{port}") is None: return False
+            on_connected(port); return True
+
+        # the open ports are probed as they are found, a wireless debugging port is
+        # connected right away and the scan stops, the other ADB-like ports are tried after the scan
+        probed_ports: list[tuple[int, AdbProbeResult]] = []
+        tried_ports: set[int] = set()
+        # the port announced by the device, the scan is the fallback
+        service = get_mdns_discovery().find_service(ADB_CONNECT_SERVICE, ip_addr_part)
+        if service is not None and try_connect_port(service.port): return
+
+        # the new port is mostly near the previous ones, the scan widens from them
+        open_ports = iter_open_ports(ip_addr_part, port_order=center_out_ports(recent_ports(ip_addr_part)))
+        try:
+            for port in open_ports:
+                result = probe_adb(ip_addr_part, port)
+                LOGGER.write(LogType.Adb, f"Port {port} probed: {result.name}")
+                if result == AdbProbeResult.Tls and try_connect_port(port): return
+                probed_ports.append((port, result))
+        except OSError as e:
+            LOGGER.write(LogType.Error, "Port scanning error: " + str(e))
+        finally: open_ports.close()
+
+        # raced in the order of their ranks, the first connected one wins
+        candidate_ports = [port for port in rank_adb_ports(probed_ports) if port not in tried_ports]
+        connected_addr = race_connect_devices([f"{ip_addr_part}:{port}" for port in candidate_ports])
+        if connected_addr is not None:
+            on_connected(int(connected_addr.rsplit(":", 1)[1])); return
+        LOGGER.write(LogType.Error, "Scanned ports: " + str(probed_ports))
         process_data_queue.put(
             ProcessError(i18n(["Port scanning failed,\nplease check the IP address.", "扫描端口失败，请检查 IP 地址是否正确。"])))
 
@@ -130,6 +174,7 @@ def mount_connecting_view(tabview: ctk.CTkTabview) -> ctk.CTkEntry:
             return
         ret = try_connect_device(addr)
         if ret is not None:
+            remember_port(get_ip_from_ip_port(addr), int(addr.rsplit(":", 1)[1]))
             process_data_queue.put(ProcessOk(addr))
             return
         process_data_queue.put(
@@ -246,6 +291,10 @@ def open_connecting_window() -> bool:
         LOGGER.write(LogType.Adb, "ADB server killed.")
         sys.exit(0)
 
+    def on_window_shown():
+        STARTUP_TIMELINE.mark("window shown")
+        STARTUP_PROFILER.report("window shown")
+
     connecting_window = ctk.CTk()
     connecting_window.iconbitmap(ICON_ICO_PATH)
     connecting_window.wm_title(i18n(["InputShare Connection", "输入流转 —— 连接"]))
@@ -258,11 +307,25 @@ def open_connecting_window() -> bool:
     tabview.pack()
 
     connecting_addr_entry = mount_connecting_view(tabview)
-    mount_pairing_view(tabview, connecting_addr_entry)
+    pairing_addr_entry = mount_pairing_view(tabview, connecting_addr_entry)
+
+    def autofill_discovered_addresses():
+        discovery = get_mdns_discovery()
+        connect_service = discovery.find_service(ADB_CONNECT_SERVICE)
+        pairing_service = discovery.find_service(ADB_PAIRING_SERVICE)
+        if connect_service is not None: autofill_entry(connecting_addr_entry, connect_service)
+        if pairing_service is not None: autofill_entry(pairing_addr_entry, pairing_service)
+        connecting_window.after(DISCOVERY_POLL_INTERVAL_MS, autofill_discovered_addresses)
+
+    if get_config().mdns_discovery:
+        get_mdns_discovery().start()
+        connecting_window.after(DISCOVERY_POLL_INTERVAL_MS, autofill_discovered_addresses)
 
     if get_config_manager().is_first_use:
         tabview.set(i18n(["Connecting", "连接"]))
 
     connecting_window.protocol("WM_DELETE_WINDOW", delete_window_callback)
+    connecting_window.after(0, on_window_shown)
     connecting_window.mainloop()
+    get_mdns_discovery().stop()
     return is_wired_connection
@@ -1,16 +1,35 @@
 import threading
+import time
+import tkinter as tk
 import customtkinter as ctk
 
+from typing import Callable
 from utils import VoidCallable, screen_size
 from utils.i18n import get_i18n
 from utils.logger import LogType, LOGGER
 
-show_event = threading.Event()
-hide_event = threading.Event()
 exit_event = threading.Event()
+request_lock = threading.Lock()
+# the latest requested visibility, None when there is no pending request
+requested_visible: bool | None = None
 
 screen_width, screen_height = screen_size()
 
+MASK_REQUEST_SEQUENCE = "<<MaskRequest>>"
+mask_root: ctk.CTk | None = None
+# set once the mask window's mainloop runs, before that the requests
+# stay pending and are handled when the loop starts
+mask_ready_event = threading.Event()
+show_requested_at: float | None = None
+
+def post_mask_request():
+    # `event_generate` from another thread is marshalled to the Tk thread,
+    # so the mask thread only wakes up when there is a request
+    if mask_root is None or not mask_ready_event.is_set(): return
+    try: mask_root.event_generate(MASK_REQUEST_SEQUENCE, when="tail")
+    except (RuntimeError, tk.TclError) as e:
+        LOGGER.write(LogType.Error, "Fullscreen mask request failed: " + str(e))
+
 def check_event(root: ctk.CTk, toplevel: ctk.CTkToplevel):
     def show_window(root: ctk.CTk, toplevel: ctk.CTkToplevel):
         root.deiconify()
@@ -21,22 +40,31 @@ def check_event(root: ctk.CTk, toplevel: ctk.CTkToplevel):
         toplevel.withdraw()
         root.withdraw()
 
-    if show_event.is_set():
-        show_window(root, toplevel)
-        show_event.clear()
-    elif hide_event.is_set():
-        hide_window(root, toplevel)
-        hide_event.clear()
-    elif exit_event.is_set():
+    global requested_visible
+    if exit_event.is_set():
         LOGGER.write(LogType.Info, "Fullscreen mask exited.")
-        root.quit()
+        root.quit(); return
 
-    interval_ms = 2 # 500 times per second
-    root.after(interval_ms, check_event, root, toplevel)
+    with request_lock:
+        is_visible, requested_visible = requested_visible, None
+    if is_visible is None: return
+    if is_visible:
+        show_window(root, toplevel)
+        if show_requested_at is not None:
+            root.update_idletasks()
+            elapsed_ms = (time.perf_counter() - show_requested_at) * 1000
+            LOGGER.write(LogType.Info, f"Fullscreen mask shown in {elapsed_ms:.1f} ms after toggling.")
+    else: hide_window(root, toplevel)
+
+def on_mask_ready(root: ctk.CTk, toplevel: ctk.CTkToplevel):
+    mask_ready_event.set()
+    # handle the requests made before the mainloop started
+    check_event(root, toplevel)
 
 def open_mask_window():
+    global mask_root
     i18n = get_i18n()
-    root = ctk.CTk()
+    root = mask_root = ctk.CTk()
     root.wm_title(i18n(["InputShare Mask", "输入流转 —— 蒙版"]))
     root.wm_attributes("-alpha", 0.01)
     root.wm_attributes("-topmost", True)
@@ -71,18 +99,30 @@ def open_mask_window():
     label1.pack(padx=8, pady=4, anchor="w")
     label2.pack(padx=8, pady=4, anchor="w")
 
-    root.after(0, check_event, root, label_toplevel)
+    root.bind(MASK_REQUEST_SEQUENCE, lambda _: check_event(root, label_toplevel))
+    root.after(0, on_mask_ready, root, label_toplevel)
     root.mainloop()
 
+ShowMaskCallable = Callable[[float | None], None]
+
 def mask_thread_factory() -> tuple[
-    VoidCallable, VoidCallable, VoidCallable,
+    ShowMaskCallable, VoidCallable, VoidCallable,
 ]:
-    def show_mask():
-        show_event.set()
+    def request_visibility(is_visible: bool):
+        global requested_visible
+        with request_lock: requested_visible = is_visible
+        post_mask_request()
+
+    def show_mask(requested_at: float | None = None):
+        # `requested_at` is the `time.perf_counter()` of the toggling request
+        global show_requested_at
+        show_requested_at = requested_at
+        request_visibility(True)
     def hide_mask():
-        hide_event.set()
+        request_visibility(False)
     def exit_mask():
         exit_event.set()
+        post_mask_request()
 
     mask_thread = threading.Thread(target=open_mask_window)
     mask_thread.start()
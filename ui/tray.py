@@ -1,4 +1,3 @@
-import socket
 import threading
 import pystray
 
@@ -7,12 +6,13 @@ from PIL import Image
 from input.controller import schedule_toggle as main_schedule_toggle,\
                              schedule_exit as main_schedule_exit
 from scrcpy_client.clipboard_event import SetClipboardEvent
+from server.scrcpy_sender import ControlSender
 from ui import ICON_ICO_PATH
 from ui.settings import open_settings_window
 from utils import VoidCallable
 from utils.config_manager import get_config
 from utils.i18n import get_i18n
-from utils.clipboard import Clipboard
+from utils.clipboard import CLIPBOARD_STATE, Clipboard
 from utils.logger import LOGGER, LogType
 
 Menu = pystray.Menu
@@ -20,19 +20,18 @@ MenuItem = pystray.MenuItem
 
 tray = None
 
-def create_tray(client_socket: socket.socket):
+def create_tray(sender: ControlSender):
     global tray
 
     def send_clipboard_text():
-        nonlocal client_socket
+        nonlocal sender
         current_clipboard_content = Clipboard.safe_paste()
         if current_clipboard_content is None:
             return
+        # sent even if unchanged, the device side may have been changed meanwhile
+        CLIPBOARD_STATE.mark_sent(current_clipboard_content)
         event = SetClipboardEvent(current_clipboard_content)
-        try:
-            client_socket.sendall(event.serialize())
-        except Exception as e:
-            LOGGER.write(LogType.Error, "Send data error: " + str(e))
+        if sender.send_bulk(event.serialize()) is not None:
             exit_tray()
 
     def toggle_share_keyboard_only(_, item: MenuItem):
@@ -81,7 +80,7 @@ def create_tray(client_socket: socket.socket):
     LOGGER.write(LogType.Info, "Tray started.")
     tray.run()
 
-def tray_thread_factory(client_socket: socket.socket) -> VoidCallable:
+def tray_thread_factory(sender: ControlSender) -> VoidCallable:
     def close_tray():
         global tray
         if tray is not None: tray.stop()
@@ -89,7 +88,7 @@ def tray_thread_factory(client_socket: socket.socket) -> VoidCallable:
 
     thread = threading.Thread(
         target=create_tray,
-        args=[client_socket],
+        args=[sender],
         daemon=True,
     )
     thread.start()
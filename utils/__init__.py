@@ -1,6 +1,5 @@
 import locale
 import time
-import screeninfo
 
 from pathlib import Path
 from typing import Any, Callable
@@ -11,6 +10,7 @@ def clamp(v: int, x: int, y: int) -> int:
     return min(max(v, x), y)
 
 def screen_size() -> tuple[int, int]:
+    import screeninfo
     monitor = screeninfo.get_monitors()[0]
     return monitor.width, monitor.height
 
@@ -2,40 +2,51 @@ import re
 import os
 import sys
 import subprocess
-import adbutils
+import threading
+import time
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import TYPE_CHECKING
 from utils import script_abs_path
+from utils.adb_session import get_adb_session
 from utils.logger import LogType, LOGGER
+from utils.tracing import traced
+
+if TYPE_CHECKING:
+    # `adbutils` is slow to import, it is loaded by the first `get_adb_client()` call
+    import adbutils
 
 script_path = script_abs_path(__file__).parent
 adb_relative_path = "adb-bin/adb.exe"
 adb_bin_path = Path.joinpath(script_path, adb_relative_path)
-__adb_client_instance: adbutils.AdbClient | None = None
-__adb_device_list: list[adbutils.AdbDevice] = []
+__adb_client_instance: "adbutils.AdbClient | None" = None
+__adb_device_list: "list[adbutils.AdbDevice]" = []
 os.environ["ADBUTILS_ADB_PATH"] = str(adb_bin_path)
 ADB_BIN_PATH = str(adb_bin_path)
 ADB_SERVER_PORT = 5038
 
 class ADBWiredConnectionError(Exception): pass
 
-def get_adb_client() -> adbutils.AdbClient:
+def get_adb_client() -> "adbutils.AdbClient":
     global __adb_client_instance
     if __adb_client_instance is None:
         # use non-default port to prevent conflict with Android Studio
+        import adbutils
         __adb_client_instance = adbutils.AdbClient(port=ADB_SERVER_PORT)
     return __adb_client_instance
 
-def get_adb_device(device_index: int = 0) -> adbutils.AdbDevice | Exception:
+def get_adb_device(device_index: int = 0) -> "adbutils.AdbDevice | Exception":
     if len(__adb_device_list) == 0:
         return ADBWiredConnectionError()
     target_device = __adb_device_list[device_index]
     LOGGER.write(LogType.Adb, "Selected device: " + str(target_device))
     return target_device
 
-def append_adb_device(device: adbutils.AdbDevice):
+def append_adb_device(device: "adbutils.AdbDevice"):
     __adb_device_list.append(device)
 
+@traced("start_adb_server")
 def start_adb_server():
     command = f"{ADB_BIN_PATH} -P {ADB_SERVER_PORT} start-server"
     process = subprocess.Popen(
@@ -70,30 +81,74 @@ def try_pairing(addr: str, pairing_code: str, timeout=3.0) -> bool:
         LOGGER.write(LogType.Error, "ADB failed to pair: " + str(e))
         return False
 
-def try_connect_device(addr: str, timeout: float=3.0) -> adbutils.AdbClient | None:
+@traced("connect_device")
+def connect_device(addr: str, timeout: float=3.0) -> "adbutils.AdbDevice | None":
+    # connects without selecting the device, so that the attempts can run in parallel
+    from adbutils import AdbTimeout
     client = get_adb_client()
     try:
         output = client.connect(addr, timeout)
-        assert len(client.device_list()) > 0
-        for device in client.iter_device():
-            if device.serial == addr:
-                append_adb_device(device)
-                break
         LOGGER.write(LogType.Adb, output)
         if output.startswith("failed"): return None
-    except adbutils.AdbTimeout as e:
-        client.disconnect(addr)
+        for device in client.iter_device():
+            if device.serial == addr: return device
+        LOGGER.write(LogType.Error, "Connected device not listed: " + addr)
+    except AdbTimeout as e:
         LOGGER.write(LogType.Error, "Connect timeout: " + str(e))
-        return None
     except Exception as e:
-        client.disconnect(addr)
         LOGGER.write(LogType.Error, "Connect failed: " + str(e))
-        return None
-    return client
+    client.disconnect(addr)
+    return None
+
+def try_connect_device(addr: str, timeout: float=3.0) -> "adbutils.AdbClient | None":
+    device = connect_device(addr, timeout)
+    if device is None: return None
+    append_adb_device(device)
+    return get_adb_client()
+
+MAX_PARALLEL_CONNECTS = 4
+
+@traced("race_connect_devices")
+def race_connect_devices(addrs: list[str], max_parallel: int=MAX_PARALLEL_CONNECTS, timeout: float=3.0) -> str | None:
+    """
+    Connects `addrs` concurrently, at most `max_parallel` at once and in their order.
+    The first connected device is selected and its address returned,
+    the attempts not started are cancelled and the other connected ones disconnected.
+    """
+    if len(addrs) == 0: return None
+    client = get_adb_client()
+    start_time = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=max_parallel)
+    futures = {executor.submit(connect_device, addr, timeout): addr for addr in addrs}
+    winner_addr: str | None = None
+    try:
+        for future in as_completed(futures):
+            device = future.result()
+            if device is None: continue
+            winner_addr = futures[future]
+            append_adb_device(device)
+            break
+    finally:
+        for future in futures: future.cancel()
+        executor.shutdown(wait=False)
+
+    if winner_addr is not None:
+        LOGGER.write(LogType.Adb, f"Connected {winner_addr} in {(time.perf_counter() - start_time) * 1000:.0f} ms, " +
+                                  f"raced with {len(addrs) - 1} other addresses.")
+
+    def disconnect_losers():
+        # the running attempts can not be interrupted, they are disconnected once done
+        for future, addr in futures.items():
+            if addr == winner_addr or future.cancelled(): continue
+            if future.result() is None: continue
+            client.disconnect(addr)
+            LOGGER.write(LogType.Adb, "Disconnected the raced address: " + addr)
+    threading.Thread(target=disconnect_losers, daemon=True).start()
+    return winner_addr
 
-def get_display_size(adb_client: adbutils.AdbClient) -> tuple[int, int]:
+def get_display_size(adb_client: "adbutils.AdbClient") -> tuple[int, int]:
     device = adb_client.device_list()[0]
-    output = str(device.shell("dumpsys window displays"))
+    output = get_adb_session(device).shell("dumpsys window displays")
 
     size_pattern = re.compile(r'cur=\d+x\d+')
     size_match = size_pattern.search(output)
@@ -0,0 +1,130 @@
+import socket
+import threading
+import uuid
+
+from typing import TYPE_CHECKING
+from utils.logger import LOGGER, LogType
+from utils.tracing import TRACER
+
+if TYPE_CHECKING:
+    import adbutils
+
+SHELL_TIMEOUT_SEC = 10
+SHELL_READ_SIZE = 4096
+
+class PersistentShell:
+    """
+    A `sh` kept running on the device, each command is written to its stdin
+    and its output read up to a marker line, without opening a new ADB stream.
+    """
+    def __init__(self, device: "adbutils.AdbDevice") -> None:
+        self.__connection = device.shell("sh", stream=True)
+        assert not isinstance(self.__connection, str)
+        self.__marker = f"--inputshare-{uuid.uuid4().hex}--".encode()
+        self.__buffer = b""
+
+    def run(self, command: str, timeout: float) -> str:
+        client_socket = self.__connection.conn
+        client_socket.settimeout(timeout)
+        # the subshell keeps `2>&1` applying to every part of the command,
+        # and the stdin of the command is not the stdin of this shell
+        client_socket.sendall(f"( {command} ) </dev/null 2>&1; echo; echo {self.__marker.decode()}\n".encode())
+        terminator = b"\n" + self.__marker + b"\n"
+        while (index := self.__buffer.find(terminator)) < 0:
+            chunk = client_socket.recv(SHELL_READ_SIZE)
+            if len(chunk) == 0: raise ConnectionResetError("Persistent shell closed")
+            self.__buffer += chunk
+        output, self.__buffer = self.__buffer[:index], self.__buffer[index + len(terminator):]
+        return output.decode(errors="replace")
+
+    def close(self):
+        self.__connection.close()
+
+class AdbSession:
+    """
+    Runs the shell commands of one device over a small pool of persistent shells,
+    falling back to a one-shot `device.shell` when the pool is busy or unusable.
+    """
+    POOL_SIZE = 2
+
+    def __init__(self, device: "adbutils.AdbDevice") -> None:
+        self.device = device
+        self.__lock = threading.Lock()
+        self.__idle_shells: list[PersistentShell] = []
+        self.__shell_count = 0
+        self.__is_persistent_available = True
+
+    def __acquire(self) -> PersistentShell | None:
+        with self.__lock:
+            if len(self.__idle_shells) > 0: return self.__idle_shells.pop()
+            if not self.__is_persistent_available or\
+               self.__shell_count >= AdbSession.POOL_SIZE: return None
+            self.__shell_count += 1
+        try: return PersistentShell(self.device)
+        except Exception as e:
+            LOGGER.write(LogType.Adb, "Persistent shell unavailable, using one-shot shells: " + str(e))
+            with self.__lock:
+                self.__shell_count -= 1
+                self.__is_persistent_available = False
+            return None
+
+    def __discard(self, shell: PersistentShell):
+        shell.close()
+        with self.__lock: self.__shell_count -= 1
+
+    def shell(self, command: str, timeout: float=SHELL_TIMEOUT_SEC) -> str:
+        with TRACER.span("adb shell", command=command):
+            shell = self.__acquire()
+            if shell is None:
+                output = self.device.shell(command, timeout=timeout)
+                assert type(output) == str
+                return output
+            try: output = shell.run(command, timeout)
+            except socket.timeout as e:
+                from adbutils import AdbTimeout
+                self.__discard(shell)
+                raise AdbTimeout(str(e))
+            except OSError as e:
+                LOGGER.write(LogType.Adb, "Persistent shell failed, retrying with a one-shot shell: " + str(e))
+                self.__discard(shell)
+                output = self.device.shell(command, timeout=timeout)
+                assert type(output) == str
+                return output
+            with self.__lock: self.__idle_shells.append(shell)
+            # the same as the `rstrip` of `device.shell`
+            return output.rstrip()
+
+    def shell_batch(self, commands: list[str], timeout: float=SHELL_TIMEOUT_SEC) -> list[str]:
+        # several short commands in one round-trip, their outputs split by a separator line
+        separator = f"--inputshare-batch-{uuid.uuid4().hex}--"
+        output = self.shell(f"; echo {separator}; ".join(commands), timeout)
+        sections = [section.strip() for section in output.split(separator)]
+        return (sections + [""] * len(commands))[:len(commands)]
+
+    def shell_stream(self, command: str) -> "adbutils.AdbConnection":
+        # for the long-running commands, the connection is owned by the caller
+        connection = self.device.shell(command, stream=True)
+        assert not isinstance(connection, str)
+        return connection
+
+    def close(self):
+        with self.__lock:
+            shells, self.__idle_shells = self.__idle_shells, []
+            self.__shell_count -= len(shells)
+        for shell in shells: shell.close()
+
+__session_instances: dict[str, AdbSession] = {}
+__session_instances_lock = threading.Lock()
+def get_adb_session(device: "adbutils.AdbDevice") -> AdbSession:
+    # shared by the deployments running in parallel
+    with __session_instances_lock:
+        session = __session_instances.get(device.serial)
+        if session is None:
+            session = __session_instances[device.serial] = AdbSession(device)
+    return session
+
+def close_adb_sessions():
+    with __session_instances_lock:
+        sessions = list(__session_instances.values())
+        __session_instances.clear()
+    for session in sessions: session.close()
@@ -1,32 +1,139 @@
+import hashlib
 import threading
 import time
-import pyperclip
 
+from collections import deque
+from utils.clipboard_backend import ClipboardBackend, create_clipboard_backend
 from utils.logger import LOGGER, LogType
 
 class Clipboard:
-    wait_time_second = 0.1
-    retry_times = 5
-    clipboard_lock = threading.Lock()
+    backend: ClipboardBackend | None = None
+    backend_lock = threading.Lock()
+
+    @staticmethod
+    def get_backend() -> ClipboardBackend:
+        with Clipboard.backend_lock:
+            if Clipboard.backend is None:
+                from utils.config_manager import get_config
+                Clipboard.backend = create_clipboard_backend(get_config().clipboard_backend)
+            return Clipboard.backend
 
     @staticmethod
     def safe_paste() -> str | None:
-        with Clipboard.clipboard_lock:
-            for _ in range(Clipboard.retry_times):
-                try:
-                    return pyperclip.paste()
-                except pyperclip.PyperclipWindowsException:
-                    time.sleep(Clipboard.wait_time_second)
-            LOGGER.write(LogType.Error, "Failed to access clipboard after several attempts.")
+        try:
+            return Clipboard.get_backend().paste()
+        except Exception as e:
+            LOGGER.write(LogType.Error, "Failed to access clipboard: " + str(e))
             return None
 
     @staticmethod
     def safe_copy(text: str):
-        with Clipboard.clipboard_lock:
-            for _ in range(Clipboard.retry_times):
-                try:
-                    pyperclip.copy(text)
-                    return
-                except pyperclip.PyperclipWindowsException:
-                    time.sleep(Clipboard.wait_time_second)
-            LOGGER.write(LogType.Error, "Failed to copy to clipboard after several attempts.")
+        try:
+            Clipboard.get_backend().copy(text)
+        except Exception as e:
+            LOGGER.write(LogType.Error, "Failed to copy to clipboard: " + str(e))
+
+    @staticmethod
+    def sequence_number() -> int | None:
+        try:
+            return Clipboard.get_backend().sequence_number()
+        except Exception: return None
+
+def content_digest(text: str) -> bytes:
+    # stable across the processes and the runs, unlike `hash`
+    return hashlib.blake2b(text.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+
+class ClipboardState:
+    """
+    Remembers the clipboard contents synced between the PC and the device by
+    their digests, so a content is sent or applied at most once, and the echoes
+    of recently synced contents coming back from either side are ignored.
+    """
+    HISTORY_SIZE = 16
+    ECHO_WINDOW_SEC = 3.0
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        # the content both sides are known to have,
+        # None once the local clipboard changed to a content not synced yet
+        self.__current_digest: bytes | None = None
+        # (digest, synced time, is sent to the device) of the recently synced contents
+        self.__history: deque[tuple[bytes, float, bool]] = deque(maxlen=ClipboardState.HISTORY_SIZE)
+        # the last applied content, and whether the local change it caused was noticed
+        self.__own_write: tuple[bytes, bool] | None = None
+        # without the change notifications, the local clipboard may have changed since any sync
+        self.__is_tracking_local_changes = True
+        self.skipped_send_count = 0
+        self.suppressed_echo_count = 0
+
+    def __mark_synced(self, digest: bytes, is_sent: bool):
+        self.__current_digest = digest
+        self.__history.append((digest, time.perf_counter(), is_sent))
+
+    def __is_recent_echo(self, digest: bytes, is_sent: bool) -> bool:
+        # the echo of a sent content comes back from the device,
+        # the echo of an applied content is the local clipboard change it caused
+        current_time = time.perf_counter()
+        for synced_digest, synced_time, synced_is_sent in self.__history:
+            if synced_digest == digest and synced_is_sent == is_sent and\
+               current_time - synced_time < ClipboardState.ECHO_WINDOW_SEC: return True
+        return False
+
+    def note_local_change(self):
+        """
+        Called when the local clipboard changed, from the change notifications
+        of the clipboard watcher, the synced content is no longer there.
+        Except for the first change after an apply, which is the apply itself,
+        the change is a copy of the user, no content is an echo anymore.
+        """
+        with self.__lock:
+            self.__current_digest = None
+            self.__history.clear()
+            if self.__own_write is not None and not self.__own_write[1]:
+                self.__own_write = (self.__own_write[0], True)
+            else: self.__own_write = None
+
+    def set_local_changes_tracked(self, is_tracked: bool):
+        # only the echoes are suppressed when the local changes are not noticed
+        with self.__lock: self.__is_tracking_local_changes = is_tracked
+
+    def should_send(self, text: str) -> bool:
+        """
+        Returns True when the local `text` should be sent to the device,
+        it is then considered synced.
+        """
+        digest = content_digest(text)
+        with self.__lock:
+            is_own_write = self.__own_write is not None and self.__own_write[0] == digest
+            self.__own_write = None
+            if is_own_write or digest == self.__current_digest or\
+               self.__is_recent_echo(digest, is_sent=False):
+                self.skipped_send_count += 1
+                return False
+            self.__mark_synced(digest, is_sent=True)
+        return True
+
+    def should_apply(self, text: str) -> bool:
+        """
+        Returns True when the `text` received from the device should be
+        copied into the local clipboard, it is then considered synced.
+        """
+        digest = content_digest(text)
+        with self.__lock:
+            is_current = self.__is_tracking_local_changes and digest == self.__current_digest
+            if is_current or self.__is_recent_echo(digest, is_sent=True):
+                self.suppressed_echo_count += 1
+                return False
+            self.__mark_synced(digest, is_sent=False)
+            self.__own_write = (digest, False)
+        return True
+
+    def mark_sent(self, text: str):
+        # for the explicit sends that bypass `should_send`
+        digest = content_digest(text)
+        with self.__lock: self.__mark_synced(digest, is_sent=True)
+
+    def summary(self) -> str:
+        return f"skipped sends: {self.skipped_send_count}, suppressed echoes: {self.suppressed_echo_count}"
+
+CLIPBOARD_STATE = ClipboardState()
@@ -0,0 +1,393 @@
+import os
+import queue
+import sys
+import threading
+import time
+
+from typing import Any, Callable, Protocol
+from utils.logger import LOGGER, LogType
+
+class ClipboardAccessException(Exception): pass
+
+class ClipboardBackend(Protocol):
+    name: str
+    def paste(self) -> str: ...
+    def copy(self, text: str): ...
+    # a counter changed by every clipboard update, None if the backend has no cheap way to get it
+    def sequence_number(self) -> int | None: ...
+
+class ChangeCounter(Protocol):
+    # incremented by every clipboard update, cheap enough to be polled
+    def count(self) -> int: ...
+
+class XFixesChangeCounter:
+    """
+    Counts the owner changes of the CLIPBOARD selection, notified by the XFixes
+    extension on an X connection of its own, every copy sets the owner again.
+    On Wayland, the copies of the native clients are only seen when the
+    compositor bridges the clipboard to XWayland.
+    """
+    SET_SELECTION_OWNER_NOTIFY_MASK = 1
+    SELECTION_NOTIFY = 0 # relative to the event base of the extension
+    XEVENT_SIZE = 24 * 8 # XEvent is a union padded to 24 longs
+
+    def __init__(self) -> None:
+        import ctypes, ctypes.util
+        xlib_path = ctypes.util.find_library("X11")
+        xfixes_path = ctypes.util.find_library("Xfixes")
+        if xlib_path is None or xfixes_path is None:
+            raise ClipboardAccessException("libX11 or libXfixes not found")
+        xlib = ctypes.CDLL(xlib_path)
+        xfixes = ctypes.CDLL(xfixes_path)
+        def bind(dll: Any, name: str, argtypes: list, restype: Any) -> Any:
+            func = getattr(dll, name)
+            func.argtypes, func.restype = argtypes, restype
+            return func
+
+        c_int_p = ctypes.POINTER(ctypes.c_int)
+        open_display = bind(xlib, "XOpenDisplay", [ctypes.c_char_p], ctypes.c_void_p)
+        close_display = bind(xlib, "XCloseDisplay", [ctypes.c_void_p], ctypes.c_int)
+        intern_atom = bind(xlib, "XInternAtom", [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int], ctypes.c_ulong)
+        default_root_window = bind(xlib, "XDefaultRootWindow", [ctypes.c_void_p], ctypes.c_ulong)
+        flush = bind(xlib, "XFlush", [ctypes.c_void_p], ctypes.c_int)
+        query_extension = bind(xfixes, "XFixesQueryExtension", [ctypes.c_void_p, c_int_p, c_int_p], ctypes.c_int)
+        query_version = bind(xfixes, "XFixesQueryVersion", [ctypes.c_void_p, c_int_p, c_int_p], ctypes.c_int)
+        select_selection_input = bind(xfixes, "XFixesSelectSelectionInput",
+            [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong], None)
+        self.__pending = bind(xlib, "XPending", [ctypes.c_void_p], ctypes.c_int)
+        self.__next_event = bind(xlib, "XNextEvent", [ctypes.c_void_p, ctypes.c_void_p], ctypes.c_int)
+
+        display = open_display(None)
+        if not display: raise ClipboardAccessException("XOpenDisplay failed")
+        event_base, error_base = ctypes.c_int(), ctypes.c_int()
+        major_version, minor_version = ctypes.c_int(1), ctypes.c_int(0)
+        if not query_extension(display, ctypes.byref(event_base), ctypes.byref(error_base)) or\
+           not query_version(display, ctypes.byref(major_version), ctypes.byref(minor_version)):
+            close_display(display)
+            raise ClipboardAccessException("XFixes extension not available")
+        clipboard_atom = intern_atom(display, b"CLIPBOARD", 0)
+        select_selection_input(display, default_root_window(display), clipboard_atom,
+            XFixesChangeCounter.SET_SELECTION_OWNER_NOTIFY_MASK)
+        flush(display)
+
+        self.__ctypes = ctypes
+        self.__display = display
+        self.__notify_type = event_base.value + XFixesChangeCounter.SELECTION_NOTIFY
+        self.__event = ctypes.create_string_buffer(XFixesChangeCounter.XEVENT_SIZE)
+        self.__lock = threading.Lock()
+        self.__count = 0
+
+    def count(self) -> int:
+        # `XPending` reads the queued events without blocking
+        with self.__lock:
+            while self.__pending(self.__display) > 0:
+                self.__next_event(self.__display, self.__event)
+                if self.__ctypes.c_int.from_buffer(self.__event).value == self.__notify_type:
+                    self.__count += 1
+            return self.__count
+
+class MacPasteboardChangeCounter:
+    """
+    Reads `changeCount` of the general `NSPasteboard` through the Objective-C runtime.
+    """
+    def __init__(self) -> None:
+        import ctypes, ctypes.util
+        objc_path = ctypes.util.find_library("objc")
+        appkit_path = ctypes.util.find_library("AppKit")
+        if objc_path is None or appkit_path is None:
+            raise ClipboardAccessException("libobjc or AppKit not found")
+        objc = ctypes.CDLL(objc_path)
+        # registers the AppKit classes to the runtime
+        ctypes.CDLL(appkit_path)
+        get_class = objc.objc_getClass
+        get_class.argtypes, get_class.restype = [ctypes.c_char_p], ctypes.c_void_p
+        register_selector = objc.sel_registerName
+        register_selector.argtypes, register_selector.restype = [ctypes.c_char_p], ctypes.c_void_p
+        # `objc_msgSend` is called through the exact signature of each method
+        send_object_message = ctypes.CFUNCTYPE(ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p)(
+            ("objc_msgSend", objc))
+        self.__send_long_message = ctypes.CFUNCTYPE(ctypes.c_long, ctypes.c_void_p, ctypes.c_void_p)(
+            ("objc_msgSend", objc))
+
+        pasteboard_class = get_class(b"NSPasteboard")
+        if not pasteboard_class: raise ClipboardAccessException("NSPasteboard not found")
+        # the shared instance, not autoreleased
+        self.__pasteboard = send_object_message(pasteboard_class, register_selector(b"generalPasteboard"))
+        self.__change_count_selector = register_selector(b"changeCount")
+
+    def count(self) -> int:
+        return self.__send_long_message(self.__pasteboard, self.__change_count_selector)
+
+def create_change_counter() -> ChangeCounter | None:
+    # None when the platform gives no cheap way to notice the clipboard changes
+    try:
+        if sys.platform == "darwin": return MacPasteboardChangeCounter()
+        if os.environ.get("DISPLAY"): return XFixesChangeCounter()
+    except Exception as e:
+        LOGGER.write(LogType.Info, "Clipboard change counter unavailable: " + str(e))
+    return None
+
+class Win32ClipboardBackend:
+    """
+    Calls the Win32 clipboard API in-process through ctypes,
+    only the `OpenClipboard` contention with other programs is retried.
+    """
+    name = "win32"
+    CF_UNICODETEXT = 13
+    GMEM_MOVEABLE = 0x0002
+    OPEN_RETRY_TIMES = 20
+    OPEN_RETRY_INTERVAL_SEC = 0.005
+
+    def __init__(self) -> None:
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.WinDLL("user32", use_last_error=True)
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        def bind(dll: Any, name: str, argtypes: list, restype: Any) -> Any:
+            func = getattr(dll, name)
+            func.argtypes, func.restype = argtypes, restype
+            return func
+
+        self.__ctypes = ctypes
+        self.__open = bind(user32, "OpenClipboard", [wintypes.HWND], wintypes.BOOL)
+        self.__close = bind(user32, "CloseClipboard", [], wintypes.BOOL)
+        self.__empty = bind(user32, "EmptyClipboard", [], wintypes.BOOL)
+        self.__is_available = bind(user32, "IsClipboardFormatAvailable", [wintypes.UINT], wintypes.BOOL)
+        self.__get_data = bind(user32, "GetClipboardData", [wintypes.UINT], wintypes.HANDLE)
+        self.__set_data = bind(user32, "SetClipboardData", [wintypes.UINT, wintypes.HANDLE], wintypes.HANDLE)
+        self.__global_alloc = bind(kernel32, "GlobalAlloc", [wintypes.UINT, ctypes.c_size_t], wintypes.HGLOBAL)
+        self.__global_free = bind(kernel32, "GlobalFree", [wintypes.HGLOBAL], wintypes.HGLOBAL)
+        self.__global_lock = bind(kernel32, "GlobalLock", [wintypes.HGLOBAL], wintypes.LPVOID)
+        self.__global_unlock = bind(kernel32, "GlobalUnlock", [wintypes.HGLOBAL], wintypes.BOOL)
+        self.__get_sequence_number = bind(user32, "GetClipboardSequenceNumber", [], wintypes.DWORD)
+
+    def __open_clipboard(self):
+        for _ in range(Win32ClipboardBackend.OPEN_RETRY_TIMES):
+            if self.__open(None): return
+            # another program is holding the clipboard
+            time.sleep(Win32ClipboardBackend.OPEN_RETRY_INTERVAL_SEC)
+        raise ClipboardAccessException("OpenClipboard failed, error " + str(self.__ctypes.get_last_error()))
+
+    def paste(self) -> str:
+        self.__open_clipboard()
+        try:
+            if not self.__is_available(Win32ClipboardBackend.CF_UNICODETEXT): return ""
+            handle = self.__get_data(Win32ClipboardBackend.CF_UNICODETEXT)
+            if not handle: return ""
+            pointer = self.__global_lock(handle)
+            if not pointer: return ""
+            try: return self.__ctypes.wstring_at(pointer)
+            finally: self.__global_unlock(handle)
+        finally: self.__close()
+
+    def __set_data_bytes(self, format: int, data: Any):
+        # `data` is a ctypes buffer, copied into a global memory handle
+        ctypes = self.__ctypes
+        size = ctypes.sizeof(data)
+        handle = self.__global_alloc(Win32ClipboardBackend.GMEM_MOVEABLE, size)
+        if not handle: raise ClipboardAccessException("GlobalAlloc failed")
+        pointer = self.__global_lock(handle)
+        if not pointer:
+            self.__global_free(handle)
+            raise ClipboardAccessException("GlobalLock failed")
+        ctypes.memmove(pointer, data, size)
+        self.__global_unlock(handle)
+
+        try: self.__open_clipboard()
+        except ClipboardAccessException:
+            self.__global_free(handle); raise
+        try:
+            self.__empty()
+            # on success the system owns the memory
+            if not self.__set_data(format, handle):
+                self.__global_free(handle)
+                raise ClipboardAccessException("SetClipboardData failed, error " + str(ctypes.get_last_error()))
+        finally: self.__close()
+
+    def copy(self, text: str):
+        self.__set_data_bytes(Win32ClipboardBackend.CF_UNICODETEXT, self.__ctypes.create_unicode_buffer(text))
+
+    def sequence_number(self) -> int | None:
+        # does not open the clipboard, cheap enough to be polled
+        return self.__get_sequence_number()
+
+class TkClipboardBackend:
+    """
+    Starts a second, hidden Tk root on a thread of its own, apart from the one
+    of the UI, and keeps it alive, so the copied text stays served by this
+    process instead of by a forked `xclip` / `xsel`.
+    Tk only speaks X11, on Wayland it needs XWayland (`DISPLAY` set).
+    """
+    name = "tk"
+    REQUEST_SEQUENCE = "<<ClipboardRequest>>"
+    START_TIMEOUT_SEC = 3
+    REQUEST_TIMEOUT_SEC = 2
+
+    def __init__(self) -> None:
+        import tkinter as tk
+        self.__tk = tk
+        self.__root: Any = None
+        self.__start_error: Exception | None = None
+        self.__requests: queue.SimpleQueue[Callable[[], None]] = queue.SimpleQueue()
+        # set once the backend is chosen, see `create_clipboard_backend`
+        self.change_counter: ChangeCounter | None = None
+        ready_event = threading.Event()
+        threading.Thread(target=self.__tk_thread, args=[ready_event], daemon=True).start()
+        if not ready_event.wait(TkClipboardBackend.START_TIMEOUT_SEC):
+            raise ClipboardAccessException("Tk clipboard thread did not start")
+        if self.__start_error is not None: raise self.__start_error
+
+    def __tk_thread(self, ready_event: threading.Event):
+        try:
+            root = self.__tk.Tk()
+            root.withdraw()
+        except Exception as e:
+            self.__start_error = e
+            ready_event.set(); return
+        root.bind(TkClipboardBackend.REQUEST_SEQUENCE, lambda _: self.__handle_requests())
+        self.__root = root
+        root.after(0, ready_event.set)
+        root.mainloop()
+
+    def __handle_requests(self):
+        while True:
+            try: request = self.__requests.get_nowait()
+            except queue.Empty: break
+            request()
+
+    def __call(self, func: Callable[[Any], Any]) -> Any:
+        # the Tk objects are only touched by the Tk thread
+        done_event = threading.Event()
+        result: list[Any] = [None, None]
+        def request():
+            try: result[0] = func(self.__root)
+            except Exception as e: result[1] = e
+            finally: done_event.set()
+        self.__requests.put(request)
+        self.__root.event_generate(TkClipboardBackend.REQUEST_SEQUENCE, when="tail")
+        if not done_event.wait(TkClipboardBackend.REQUEST_TIMEOUT_SEC):
+            raise ClipboardAccessException("Tk clipboard request timed out")
+        if result[1] is not None: raise result[1]
+        return result[0]
+
+    def paste(self) -> str:
+        tk = self.__tk
+        def paste_in_tk(root: Any) -> str:
+            try:
+                if root._windowingsystem == "x11":
+                    return root.clipboard_get(type="UTF8_STRING")
+                return root.clipboard_get()
+            except tk.TclError: return "" # empty or non-text clipboard
+        return self.__call(paste_in_tk)
+
+    def copy(self, text: str):
+        def copy_in_tk(root: Any):
+            root.clipboard_clear()
+            root.clipboard_append(text)
+            root.update_idletasks()
+        self.__call(copy_in_tk)
+
+    def sequence_number(self) -> int | None:
+        if self.change_counter is None: return None
+        return self.change_counter.count()
+
+class PyperclipClipboardBackend:
+    name = "pyperclip"
+    wait_time_second = 0.1
+    retry_times = 5
+
+    def __init__(self) -> None:
+        import pyperclip
+        self.__pyperclip = pyperclip
+        self.__lock = threading.Lock()
+        # set once the backend is chosen, see `create_clipboard_backend`
+        self.change_counter: ChangeCounter | None = None
+
+    def paste(self) -> str:
+        pyperclip = self.__pyperclip
+        with self.__lock:
+            for _ in range(PyperclipClipboardBackend.retry_times):
+                try: return pyperclip.paste()
+                except pyperclip.PyperclipWindowsException:
+                    time.sleep(PyperclipClipboardBackend.wait_time_second)
+        raise ClipboardAccessException("Failed to access clipboard after several attempts.")
+
+    def copy(self, text: str):
+        pyperclip = self.__pyperclip
+        with self.__lock:
+            for _ in range(PyperclipClipboardBackend.retry_times):
+                try: pyperclip.copy(text); return
+                except pyperclip.PyperclipWindowsException:
+                    time.sleep(PyperclipClipboardBackend.wait_time_second)
+        raise ClipboardAccessException("Failed to copy to clipboard after several attempts.")
+
+    def sequence_number(self) -> int | None:
+        if self.change_counter is None: return None
+        return self.change_counter.count()
+
+BACKEND_TYPES: dict[str, Callable[[], ClipboardBackend]] = {
+    Win32ClipboardBackend.name: Win32ClipboardBackend,
+    TkClipboardBackend.name: TkClipboardBackend,
+    PyperclipClipboardBackend.name: PyperclipClipboardBackend,
+}
+
+def default_backend_order() -> list[str]:
+    if sys.platform == "win32":
+        return [Win32ClipboardBackend.name, PyperclipClipboardBackend.name]
+    # Tk can not connect to a Wayland session without XWayland
+    if os.environ.get("DISPLAY"):
+        return [TkClipboardBackend.name, PyperclipClipboardBackend.name]
+    return [PyperclipClipboardBackend.name]
+
+def create_clipboard_backend(preferred: str="auto") -> ClipboardBackend:
+    # `preferred` is a backend name or "auto", pyperclip is always the last resort
+    order = default_backend_order() if preferred not in BACKEND_TYPES else\
+            [preferred, PyperclipClipboardBackend.name]
+    backend: ClipboardBackend | None = None
+    for name in order:
+        try:
+            backend = BACKEND_TYPES[name]()
+            LOGGER.write(LogType.Info, "Clipboard backend: " + name)
+            break
+        except Exception as e:
+            LOGGER.write(LogType.Error, f"Clipboard backend {name} unavailable: " + str(e))
+    if backend is None: backend = PyperclipClipboardBackend()
+    # only for the chosen backend, a failed one would leak its connection
+    if isinstance(backend, (TkClipboardBackend, PyperclipClipboardBackend)):
+        backend.change_counter = create_change_counter()
+    return backend
+
+# --- --- --- --- --- ---
+
+def benchmark_backends(rounds: int=200, text_size: int=1024):
+    # usage: python -m utils.clipboard_backend [rounds] [text size]
+    # measures the copy / paste round trips of the backends available here, no result is assumed
+    names = [name for name in BACKEND_TYPES if name != Win32ClipboardBackend.name or sys.platform == "win32"]
+    for name in names:
+        try: backend = BACKEND_TYPES[name]()
+        except Exception as e:
+            LOGGER.write(LogType.Error, f"{name}: unavailable ({e})"); continue
+        copy_times: list[float] = []
+        paste_times: list[float] = []
+        mismatches = 0
+        try:
+            for i in range(rounds):
+                text = f"{name} {i} ".ljust(text_size, "x")
+                start_time = time.perf_counter()
+                backend.copy(text)
+                copied_time = time.perf_counter()
+                if backend.paste() != text: mismatches += 1
+                pasted_time = time.perf_counter()
+                copy_times.append(copied_time - start_time)
+                paste_times.append(pasted_time - copied_time)
+        except Exception as e:
+            LOGGER.write(LogType.Error, f"{name}: failed ({e})"); continue
+        for label, samples in (("copy", copy_times), ("paste", paste_times)):
+            samples.sort()
+            LOGGER.write(LogType.Info, f"{name} {label}: mean {sum(samples) / len(samples) * 1000:.3f} ms, " +
+                                       f"p99 {samples[int(len(samples) * 0.99) - 1] * 1000:.3f} ms")
+        if mismatches > 0: LOGGER.write(LogType.Error, f"{name}: {mismatches} mismatched pastes")
+
+if __name__ == "__main__":
+    benchmark_backends(*[int(arg) for arg in sys.argv[1:3]])
@@ -2,7 +2,7 @@ import atexit
 import sys, os
 import json
 
-from dataclasses import asdict, dataclass, fields
+from dataclasses import asdict, dataclass, field, fields
 from utils import DevicePosition, ENGLISH_LANGUAGE,\
                   current_language_code, script_abs_path
 
@@ -24,6 +24,20 @@ class ConfigFile:
     keep_wakeup: bool = False
     language: str = current_language_code() or ENGLISH_LANGUAGE
 
+    # tuning, only editable in the config file
+    send_flush_window_ms: float = 0.5
+    # HID mouse reports per second, up to 1000, 0 to follow the mouse polling rate
+    mouse_report_rate: int = 0
+    # "auto", "win32", "tk" or "pyperclip"
+    clipboard_backend: str = "auto"
+    # reads the whole clipboard every 500 ms where the platform has no change counter,
+    # otherwise the clipboard is only read before toggling to the device
+    clipboard_content_polling: bool = False
+    # fills the addresses of the wireless debugging services announced on the network
+    mdns_discovery: bool = True
+    # the recently connected wireless debugging ports by IP, scanned first
+    recent_ports: dict = field(default_factory=dict)
+
 class ConfigManager:
     def __init__(self):
         file_path = self.path = ConfigManager.storage_path()
@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+
+from dataclasses import asdict, dataclass, field, fields
+from adbutils import AdbDevice
+from utils.logger import LOGGER, LogType
+from utils.tracing import traced
+
+DEFAULT_CACHE_FILE_NAME = "deploy_cache.json"
+
+@dataclass
+class DeviceDeployState:
+    reporter_version: str = ""
+    server_digest: str = ""
+    # the remote mtime after the push, the digest is only trusted while it is unchanged
+    server_mtime: int = 0
+    server_push_duration: float = 0.0
+    # local -> remote
+    forwards: dict = field(default_factory=dict)
+
+class DeployCache:
+    """
+    What was set up on each device (by serial) in the previous runs.
+    The entries are hints only, each one is validated by a cheap check before use
+    and dropped when the check fails.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__states: dict[str, DeviceDeployState] = DeployCache.read_cache(path)
+
+    @staticmethod
+    def read_cache(path: str) -> dict[str, DeviceDeployState]:
+        try:
+            with open(path, "r") as f: content = json.load(f)
+        except (OSError, ValueError): return {}
+        if type(content) != dict: return {}
+
+        expected_fields = {f.name: f.type for f in fields(DeviceDeployState)}
+        states: dict[str, DeviceDeployState] = {}
+        for serial, item in content.items():
+            if type(item) != dict: continue
+            filtered_fields = {key: value for key, value in item.items()
+                               if key in expected_fields and type(value) == expected_fields[key]}
+            states[serial] = DeviceDeployState(**filtered_fields)
+        return states
+
+    def get(self, serial: str) -> DeviceDeployState:
+        with self.__lock:
+            state = self.__states.get(serial)
+            return DeviceDeployState(**asdict(state)) if state is not None else DeviceDeployState()
+
+    def update(self, serial: str, **changes):
+        with self.__lock:
+            state = self.__states.setdefault(serial, DeviceDeployState())
+            for key, value in changes.items(): setattr(state, key, value)
+            self.__save()
+
+    def set_forward(self, serial: str, local: str, remote: str):
+        with self.__lock:
+            state = self.__states.setdefault(serial, DeviceDeployState())
+            state.forwards[local] = remote
+            self.__save()
+
+    def __save(self):
+        # called with the lock held
+        content = {serial: asdict(state) for serial, state in self.__states.items()}
+        try:
+            # written to a temporary file first, the cache is never left half written
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as f: json.dump(content, f, indent=4)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            LOGGER.write(LogType.Error, "Saving deploy cache failed: " + str(e))
+
+@traced("forward")
+def ensure_forward(device: AdbDevice, local: str, remote: str):
+    # listing the forwards is answered by the local adb server, without a device round-trip
+    cache = get_deploy_cache()
+    if cache.get(device.serial).forwards.get(local) == remote:
+        for item in device.forward_list():
+            if item.serial == device.serial and item.local == local and item.remote == remote:
+                LOGGER.write(LogType.Adb, f"Forward {local} -> {remote} already set up.")
+                return
+    device.forward(local, remote)
+    cache.set_forward(device.serial, local, remote)
+
+__cache_instance: DeployCache | None = None
+__cache_instance_lock = threading.Lock()
+def get_deploy_cache() -> DeployCache:
+    # the deployments running in parallel must share the same instance
+    global __cache_instance
+    with __cache_instance_lock:
+        if __cache_instance is None:
+            from utils.config_manager import ConfigManager
+            config_dir = os.path.dirname(ConfigManager.storage_path())
+            __cache_instance = DeployCache(os.path.join(config_dir, DEFAULT_CACHE_FILE_NAME))
+    return __cache_instance
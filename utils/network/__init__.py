@@ -1,4 +1,7 @@
 from utils.network.ip_check     import *
 from utils.network.port_check   import *
 from utils.network.port_scan    import *
+from utils.network.port_cache   import *
+from utils.network.adb_probe    import *
+from utils.network.mdns         import *
 from utils.network.port_manager import *
@@ -0,0 +1,58 @@
+import socket
+import struct
+from enum import Enum
+
+# https://android.googlesource.com/platform/packages/modules/adb/+/refs/heads/main/protocol.txt
+ADB_COMMAND_CNXN = 0x4e584e43
+ADB_COMMAND_AUTH = 0x48545541
+ADB_COMMAND_STLS = 0x534c5453
+ADB_VERSION = 0x01000001
+ADB_MAX_DATA = 256 * 1024
+ADB_HEADER_FORMAT = "<6I"
+ADB_HEADER_SIZE = struct.calcsize(ADB_HEADER_FORMAT)
+DEFAULT_PROBE_TIMEOUT = 0.5
+
+class AdbProbeResult(Enum):
+    # in the order the ports are tried
+    Tls    = 0 # wireless debugging, adbd asks for TLS first
+    Adb    = 1 # `adb tcpip` mode
+    Silent = 2 # accepted without replying in time
+    NotAdb = 3
+
+def adb_message(command: int, arg0: int, arg1: int, payload: bytes) -> bytes:
+    # the checksum is not checked from `ADB_VERSION` on, but old adbd still need it
+    checksum = sum(payload) & 0xffffffff
+    header = struct.pack(ADB_HEADER_FORMAT,
+        command, arg0, arg1, len(payload), checksum, command ^ 0xffffffff)
+    return header + payload
+
+def probe_adb(ip: str, port: int, timeout: float=DEFAULT_PROBE_TIMEOUT) -> AdbProbeResult:
+    """
+    Sends a CNXN and checks the reply header, the device replies CNXN or AUTH,
+    or STLS for wireless debugging. The connection is closed before any key
+    is sent, so no authorization dialog shows up on the device.
+    """
+    family = socket.AF_INET6 if ":" in ip else socket.AF_INET
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect((ip, port))
+            sock.sendall(adb_message(ADB_COMMAND_CNXN, ADB_VERSION, ADB_MAX_DATA, b"host::\0"))
+            header = b""
+            while len(header) < ADB_HEADER_SIZE:
+                chunk = sock.recv(ADB_HEADER_SIZE - len(header))
+                if len(chunk) == 0: return AdbProbeResult.NotAdb
+                header += chunk
+        except socket.timeout: return AdbProbeResult.Silent
+        except OSError: return AdbProbeResult.NotAdb
+
+    command, _, _, _, _, magic = struct.unpack(ADB_HEADER_FORMAT, header)
+    if magic != command ^ 0xffffffff: return AdbProbeResult.NotAdb
+    if command == ADB_COMMAND_STLS: return AdbProbeResult.Tls
+    if command in (ADB_COMMAND_CNXN, ADB_COMMAND_AUTH): return AdbProbeResult.Adb
+    return AdbProbeResult.NotAdb
+
+def rank_adb_ports(probed_ports: list[tuple[int, AdbProbeResult]]) -> list[int]:
+    # stable sort, the ports of the same kind keep their order
+    candidates = [(result.value, port) for port, result in probed_ports if result != AdbProbeResult.NotAdb]
+    return [port for _, port in sorted(candidates, key=lambda item: item[0])]
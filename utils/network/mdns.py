@@ -0,0 +1,290 @@
+import ipaddress
+import select
+import socket
+import struct
+import threading
+import time
+
+from dataclasses import dataclass
+from typing import Callable
+from utils.logger import LOGGER, LogType
+
+MDNS_ADDRESS = "224.0.0.251"
+MDNS_PORT = 5353
+ADB_CONNECT_SERVICE = "_adb-tls-connect._tcp.local"
+ADB_PAIRING_SERVICE = "_adb-tls-pairing._tcp.local"
+# the queries are sent again with a doubling interval, the announcements are received in between
+QUERY_INITIAL_INTERVAL_SEC = 1
+QUERY_MAX_INTERVAL_SEC = 16
+MAX_PACKET_SIZE = 9000
+
+DNS_TYPE_A    = 1
+DNS_TYPE_PTR  = 12
+DNS_TYPE_AAAA = 28
+DNS_TYPE_SRV  = 33
+DNS_CLASS_IN  = 1
+DNS_HEADER_FORMAT = ">6H"
+DNS_HEADER_SIZE = struct.calcsize(DNS_HEADER_FORMAT)
+
+class DnsParseException(Exception): pass
+
+@dataclass
+class DnsRecord:
+    name: str
+    type: int
+    ttl: int
+    # the name for PTR, (target, port) for SRV, the address for A and AAAA
+    value: str | tuple[str, int] | None
+
+@dataclass
+class AdbService:
+    instance_name: str
+    service_type: str
+    ip: str
+    port: int
+    expires_at: float
+
+    @property
+    def address(self) -> str:
+        return f"[{self.ip}]:{self.port}" if ":" in self.ip else f"{self.ip}:{self.port}"
+
+def encode_name(name: str) -> bytes:
+    encoded = b""
+    for label in name.rstrip(".").split("."):
+        label_bytes = label.encode()
+        encoded += bytes([len(label_bytes)]) + label_bytes
+    return encoded + b"\0"
+
+def build_query(names: list[str]) -> bytes:
+    # the transaction id of mDNS queries is 0
+    header = struct.pack(DNS_HEADER_FORMAT, 0, 0, len(names), 0, 0, 0)
+    questions = b"".join(encode_name(name) + struct.pack(">2H", DNS_TYPE_PTR, DNS_CLASS_IN) for name in names)
+    return header + questions
+
+def read_name(data: bytes, offset: int) -> tuple[str, int]:
+    labels: list[str] = []
+    end_offset: int | None = None
+    # the compression pointers may only point backwards, a loop is not followed forever
+    for _ in range(len(data)):
+        if offset >= len(data): raise DnsParseException("Name out of range")
+        length = data[offset]
+        if length == 0:
+            if end_offset is None: end_offset = offset + 1
+            return ".".join(labels), end_offset
+        if length & 0xc0 == 0xc0:
+            if offset + 1 >= len(data): raise DnsParseException("Pointer out of range")
+            if end_offset is None: end_offset = offset + 2
+            offset = ((length & 0x3f) << 8) | data[offset + 1]
+            continue
+        labels.append(data[offset + 1:offset + 1 + length].decode(errors="replace"))
+        offset += 1 + length
+    raise DnsParseException("Name compression loop")
+
+def parse_records(data: bytes) -> list[DnsRecord]:
+    if len(data) < DNS_HEADER_SIZE: raise DnsParseException("Packet too short")
+    _, flags, question_count, *record_counts = struct.unpack_from(DNS_HEADER_FORMAT, data)
+    # only the responses are of interest
+    if flags & 0x8000 == 0: return []
+    offset = DNS_HEADER_SIZE
+    for _ in range(question_count):
+        _, offset = read_name(data, offset)
+        offset += 4
+
+    records: list[DnsRecord] = []
+    for _ in range(sum(record_counts)):
+        name, offset = read_name(data, offset)
+        if offset + 10 > len(data): raise DnsParseException("Record out of range")
+        record_type, _, ttl, data_length = struct.unpack_from(">2HIH", data, offset)
+        offset += 10
+        data_end = offset + data_length
+        if data_end > len(data): raise DnsParseException("Record data out of range")
+
+        value: str | tuple[str, int] | None = None
+        if record_type == DNS_TYPE_PTR:
+            value, _ = read_name(data, offset)
+        elif record_type == DNS_TYPE_SRV and data_length >= 6:
+            _, _, port = struct.unpack_from(">3H", data, offset)
+            target, _ = read_name(data, offset + 6)
+            value = (target, port)
+        elif record_type == DNS_TYPE_A and data_length == 4:
+            value = str(ipaddress.IPv4Address(data[offset:data_end]))
+        elif record_type == DNS_TYPE_AAAA and data_length == 16:
+            value = str(ipaddress.IPv6Address(data[offset:data_end]))
+        records.append(DnsRecord(name, record_type, ttl, value))
+        offset = data_end
+    return records
+
+def open_mdns_socket(group_address: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    if not ipaddress.ip_address(group_address).is_multicast:
+        # a unicast responder, e.g. a stand-in for testing
+        sock.bind(("", 0)); return sock
+    try:
+        sock.bind(("", port))
+        membership = struct.pack("4s4s", socket.inet_aton(group_address), socket.inet_aton("0.0.0.0"))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    except OSError as e:
+        # the port is taken by another responder, queries sent from another
+        # port are answered by unicast (RFC 6762, section 6.7)
+        LOGGER.write(LogType.Info, "mDNS port unavailable, only the replies are received: " + str(e))
+        sock.close()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.bind(("", 0))
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 255)
+    return sock
+
+class MdnsDiscovery:
+    """
+    Discovers the wireless debugging services announced by the devices,
+    the services are cached by instance name until their TTL expires.
+    """
+    SERVICE_TYPES = (ADB_CONNECT_SERVICE, ADB_PAIRING_SERVICE)
+
+    def __init__(self, group_address: str=MDNS_ADDRESS, port: int=MDNS_PORT) -> None:
+        self.group_address = group_address
+        self.port = port
+        self.__lock = threading.Lock()
+        self.__stop_event = threading.Event()
+        self.__thread: threading.Thread | None = None
+        self.__services: dict[str, AdbService] = {}
+        # the records are received in any order and in different packets,
+        # each is kept with its absolute expiry time
+        self.__instance_types: dict[str, tuple[str, float]] = {}
+        self.__instance_targets: dict[str, tuple[str, int, float]] = {}
+        self.__host_addresses: dict[str, tuple[str, float]] = {}
+        self.__callbacks: list[Callable[[AdbService], None]] = []
+
+    def add_callback(self, callback: Callable[[AdbService], None]):
+        with self.__lock: self.__callbacks.append(callback)
+
+    def services(self, service_type: str | None = None) -> list[AdbService]:
+        current_time = time.monotonic()
+        with self.__lock:
+            return [service for service in self.__services.values()
+                    if service.expires_at > current_time and
+                       (service_type is None or service.service_type == service_type)]
+
+    def find_service(self, service_type: str, ip: str | None = None) -> AdbService | None:
+        for service in self.services(service_type):
+            if ip is None or service.ip == ip: return service
+        return None
+
+    def __remove_instance(self, instance_name: str):
+        self.__services.pop(instance_name, None)
+        self.__instance_types.pop(instance_name, None)
+        self.__instance_targets.pop(instance_name, None)
+
+    def __remove_expired(self, current_time: float):
+        for records in (self.__instance_types, self.__instance_targets, self.__host_addresses):
+            expired_names = [name for name, record in records.items() if record[-1] <= current_time]
+            for name in expired_names: records.pop(name)
+        expired_services = [name for name, service in self.__services.items() if service.expires_at <= current_time]
+        for name in expired_services: self.__services.pop(name)
+
+    def handle_packet(self, data: bytes, sender_ip: str):
+        try: records = parse_records(data)
+        except DnsParseException as e:
+            LOGGER.write(LogType.Info, f"Invalid mDNS packet from {sender_ip}: {e}"); return
+
+        current_time = time.monotonic()
+        updated_services: list[AdbService] = []
+        with self.__lock:
+            self.__remove_expired(current_time)
+            # the instances named by this packet, the others are left as they are
+            touched_instances: set[str] = set()
+            touched_hosts: set[str] = set()
+            for record in records:
+                expires_at = current_time + record.ttl
+                if record.type == DNS_TYPE_PTR and record.name in MdnsDiscovery.SERVICE_TYPES:
+                    assert type(record.value) == str
+                    if record.ttl == 0:
+                        # goodbye packet, the service is gone
+                        self.__remove_instance(record.value)
+                        continue
+                    self.__instance_types[record.value] = (record.name, expires_at)
+                    touched_instances.add(record.value)
+                elif record.type == DNS_TYPE_SRV and type(record.value) == tuple:
+                    if record.ttl == 0:
+                        self.__remove_instance(record.name)
+                        continue
+                    target, port = record.value
+                    self.__instance_targets[record.name] = (target, port, expires_at)
+                    touched_instances.add(record.name)
+                elif record.type in (DNS_TYPE_A, DNS_TYPE_AAAA) and type(record.value) == str:
+                    if record.ttl == 0:
+                        self.__host_addresses.pop(record.name, None)
+                        continue
+                    # IPv4 is preferred, the devices announce link-local IPv6 addresses too
+                    if record.type == DNS_TYPE_A or record.name not in self.__host_addresses:
+                        self.__host_addresses[record.name] = (record.value, expires_at)
+                    touched_hosts.add(record.name)
+
+            touched_instances.update(instance_name
+                for instance_name, (target, _, _) in self.__instance_targets.items()
+                if target in touched_hosts)
+            for instance_name in touched_instances:
+                if instance_name not in self.__instance_types or\
+                   instance_name not in self.__instance_targets: continue
+                service_type, type_expires_at = self.__instance_types[instance_name]
+                target, port, target_expires_at = self.__instance_targets[instance_name]
+                expires_at = min(type_expires_at, target_expires_at)
+                if target in self.__host_addresses:
+                    ip, address_expires_at = self.__host_addresses[target]
+                    expires_at = min(expires_at, address_expires_at)
+                # the sender is the device itself when the address record is missing
+                else: ip = sender_ip
+                service = AdbService(instance_name, service_type, ip, port, expires_at)
+                previous = self.__services.get(instance_name)
+                self.__services[instance_name] = service
+                if previous is None or previous.address != service.address:
+                    updated_services.append(service)
+            callbacks = list(self.__callbacks)
+
+        for service in updated_services:
+            LOGGER.write(LogType.Info, f"mDNS discovered {service.service_type}: {service.address}")
+            for callback in callbacks: callback(service)
+
+    def __run(self):
+        try: sock = open_mdns_socket(self.group_address, self.port)
+        except OSError as e:
+            LOGGER.write(LogType.Error, "mDNS discovery unavailable: " + str(e)); return
+
+        query = build_query(list(MdnsDiscovery.SERVICE_TYPES))
+        query_interval = QUERY_INITIAL_INTERVAL_SEC
+        next_query_time = time.monotonic()
+        with sock:
+            while not self.__stop_event.is_set():
+                if time.monotonic() >= next_query_time:
+                    try: sock.sendto(query, (self.group_address, self.port))
+                    except OSError as e: LOGGER.write(LogType.Info, "Sending mDNS query failed: " + str(e))
+                    next_query_time = time.monotonic() + query_interval
+                    query_interval = min(query_interval * 2, QUERY_MAX_INTERVAL_SEC)
+                # woken up regularly to check the stop event
+                timeout = min(max(next_query_time - time.monotonic(), 0), 0.5)
+                readable, _, _ = select.select([sock], [], [], timeout)
+                if len(readable) == 0: continue
+                try: data, (sender_ip, _) = sock.recvfrom(MAX_PACKET_SIZE)
+                except OSError: continue
+                self.handle_packet(data, sender_ip)
+
+    def start(self):
+        if self.__thread is not None: return
+        self.__stop_event.clear()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        if self.__thread is None: return
+        self.__stop_event.set()
+        self.__thread.join()
+        self.__thread = None
+
+__discovery_instance: MdnsDiscovery | None = None
+def get_mdns_discovery() -> MdnsDiscovery:
+    global __discovery_instance
+    if __discovery_instance is None:
+        __discovery_instance = MdnsDiscovery()
+    return __discovery_instance
@@ -0,0 +1,29 @@
+import time
+
+# the wireless debugging port changes with every toggle, the recent ones are kept as hints
+RECENT_PORT_TTL_SEC = 7 * 24 * 60 * 60
+MAX_RECENT_PORTS = 4
+
+def _recent_port_entries(ip: str) -> list[list]:
+    # stored in the config file as `{ip: [[port, timestamp], ...]}`, the most recent first
+    from utils.config_manager import get_config
+    entries = get_config().recent_ports.get(ip)
+    if type(entries) != list: return []
+    expire_time = time.time() - RECENT_PORT_TTL_SEC
+    # the config file is editable, the malformed entries are skipped
+    valid_entries = [entry for entry in entries
+                     if type(entry) == list and len(entry) == 2 and
+                        type(entry[0]) == int and type(entry[1]) in (int, float) and
+                        entry[1] > expire_time]
+    valid_entries.sort(key=lambda entry: entry[1], reverse=True)
+    return valid_entries
+
+def recent_ports(ip: str) -> list[int]:
+    return [port for port, _ in _recent_port_entries(ip)]
+
+def remember_port(ip: str, port: int):
+    from utils.config_manager import get_config
+    config = get_config()
+    entries = [entry for entry in _recent_port_entries(ip) if entry[0] != port]
+    entries = [[port, time.time()]] + entries[:MAX_RECENT_PORTS - 1]
+    config.recent_ports = {**config.recent_ports, ip: entries}
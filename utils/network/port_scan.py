@@ -1,45 +1,151 @@
+import errno
 import selectors
 import socket
-from concurrent.futures import Future, ThreadPoolExecutor
+import sys
+import threading
+import time
+from typing import Iterable, Iterator
 
 from utils.logger import LOGGER, LogType
 
 DEFAULT_START_PORT = 32000
 DEFAULT_END_PORT = 47000
-DEFAULT_STEP = 512
 DEFAULT_CONNECT_TIMEOUT = 0.6
+# `select` on Windows is limited to 512 sockets
+WINDOWS_MAX_CONCURRENCY = 512
+MAX_CONCURRENCY = 2048
+# left for the rest of the process
+RESERVED_FD_COUNT = 64
+# the sockets opened between two selects, the first ports of `port_order` are checked early
+FILL_BATCH_SIZE = 128
+CONNECT_IN_PROGRESS_ERRNOS = {errno.EINPROGRESS, errno.EWOULDBLOCK, getattr(errno, "WSAEWOULDBLOCK", errno.EWOULDBLOCK)}
 
-def test_batch_port(ip: str, start_port: int, end_port: int) -> int | None:
+def max_scan_concurrency() -> int:
+    if sys.platform == "win32": return WINDOWS_MAX_CONCURRENCY
+    import resource
+    soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft_limit == resource.RLIM_INFINITY: return MAX_CONCURRENCY
+    return max(1, min(soft_limit - RESERVED_FD_COUNT, MAX_CONCURRENCY))
+
+def iter_open_ports(
+    ip: str,
+    start_port: int=DEFAULT_START_PORT,
+    end_port: int=DEFAULT_END_PORT,
+    timeout: float=DEFAULT_CONNECT_TIMEOUT,
+    stop_event: threading.Event | None = None,
+    port_order: Iterable[int] | None = None,
+) -> Iterator[int]:
+    """
+    Yields every port of [start_port, end_port) accepting a TCP connection, as soon as it is found.
+    The connections are attempted in `port_order` when it is given, e.g. `center_out_ports`.
+    The connections are attempted with a single selector, as many at once as the fd limit allows.
+    Closing the iterator (or setting `stop_event`) stops the scan and closes the pending sockets.
+    """
+    family = socket.AF_INET6 if ":" in ip else socket.AF_INET
+    concurrency = max_scan_concurrency()
     selector = selectors.DefaultSelector()
+    # port -> (deadline, socket), in the order of the deadlines
+    pending: dict[int, tuple[float, socket.socket]] = {}
+    ports = iter(port_order if port_order is not None else range(start_port, end_port))
+    next_port = next(ports, None)
+
+    def close_pending(port: int):
+        _, sock = pending.pop(port)
+        selector.unregister(sock)
+        sock.close()
+
+    try:
+        while next_port is not None or len(pending) > 0:
+            if stop_event is not None and stop_event.is_set(): return
+            open_ports: list[int] = []
+            fill_count = 0
+            while next_port is not None and len(pending) < concurrency and fill_count < FILL_BATCH_SIZE:
+                fill_count += 1
+                port, next_port = next_port, next(ports, None)
+                sock = socket.socket(family, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                error_code = sock.connect_ex((ip, port))
+                if error_code not in CONNECT_IN_PROGRESS_ERRNOS:
+                    # done right away, mostly refused on the loopback
+                    if error_code == 0: open_ports.append(port)
+                    sock.close(); continue
+                selector.register(sock, selectors.EVENT_WRITE, port)
+                pending[port] = (time.perf_counter() + timeout, sock)
+
+            if len(pending) > 0:
+                first_deadline, _ = next(iter(pending.values()))
+                is_filling = next_port is not None and len(pending) < concurrency
+                select_timeout = 0 if len(open_ports) > 0 or is_filling else max(first_deadline - time.perf_counter(), 0)
+                for key, _ in selector.select(select_timeout):
+                    sock = key.fileobj
+                    assert isinstance(sock, socket.socket)
+                    # writable also when the connection failed
+                    if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                        open_ports.append(key.data)
+                    close_pending(key.data)
 
-    for port in range(start_port, end_port):
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.setblocking(False)
-        sock.connect_ex((ip, port))
-        selector.register(sock, selectors.EVENT_WRITE)
+                # the ready sockets are handled before the expired ones,
+                # a connection made while the caller held the iterator is not lost
+                current_time = time.perf_counter()
+                expired_ports: list[int] = []
+                for port, (deadline, _) in pending.items():
+                    if deadline > current_time: break
+                    expired_ports.append(port)
+                for port in expired_ports: close_pending(port)
+            yield from open_ports
+    finally:
+        for port in list(pending): close_pending(port)
+        selector.close()
 
-    events = selector.select(timeout=DEFAULT_CONNECT_TIMEOUT)
-    port = None
-    for event_key, _ in events:
-        target_sock = event_key.fileobj
-        _, port = target_sock.getpeername() # type: ignore
-    selector.close()
-    if port is not None: return port
+def center_out_ports(centers: list[int], start_port: int=DEFAULT_START_PORT, end_port: int=DEFAULT_END_PORT) -> Iterator[int]:
+    """
+    Yields every port of [start_port, end_port) once, ordered by the distance
+    to the nearest of `centers`, the range is scanned in order without centers.
+    """
+    centers = [center for center in centers if start_port <= center < end_port]
+    if len(centers) == 0:
+        yield from range(start_port, end_port); return
+    yielded_ports: set[int] = set()
+    for distance in range(end_port - start_port):
+        for center in centers:
+            for port in (center - distance, center + distance):
+                if start_port <= port < end_port and port not in yielded_ports:
+                    yielded_ports.add(port)
+                    yield port
+        if len(yielded_ports) == end_port - start_port: return
 
 def scan_port(ip: str) -> list[int]:
-    executor = ThreadPoolExecutor(max_workers=4)
-    futures: list[Future] = []
-    for i in range(DEFAULT_START_PORT, DEFAULT_END_PORT, DEFAULT_STEP):
-        future = executor.submit(test_batch_port, ip, i, min(DEFAULT_END_PORT, i + DEFAULT_STEP))
-        futures.append(future)
-
-    target_ports = []
-    for future in futures:
-        try:
-            result = future.result()
-            if result is None: continue
-            target_ports.append(result)
-        except Exception as e:
-            LOGGER.write(LogType.Error, "Port scanning error: " + str(e))
-    executor.shutdown(cancel_futures=True)
-    return target_ports
+    try: return list(iter_open_ports(ip))
+    except Exception as e:
+        LOGGER.write(LogType.Error, "Port scanning error: " + str(e))
+        return []
+
+def benchmark_scan(listener_count: int=16):
+    # usage: python -c "from utils.network.port_scan import benchmark_scan; benchmark_scan()"
+    # `python -m` runs this module a second time, as it is imported by `utils.network`
+    # scans the loopback with listeners spread across the scanned range
+    import random
+
+    listeners: list[socket.socket] = []
+    for port in random.sample(range(DEFAULT_START_PORT, DEFAULT_END_PORT), listener_count * 4):
+        if len(listeners) == listener_count: break
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try: listener.bind(("127.0.0.1", port))
+        except OSError: listener.close(); continue
+        listener.listen(listener_count)
+        listeners.append(listener)
+    expected_ports = sorted(listener.getsockname()[1] for listener in listeners)
+
+    start_time = time.perf_counter()
+    first_port_time = None
+    found_ports = []
+    for port in iter_open_ports("127.0.0.1"):
+        if first_port_time is None: first_port_time = time.perf_counter() - start_time
+        found_ports.append(port)
+    total_time = time.perf_counter() - start_time
+    # other processes may listen in the range too
+    missing_ports = set(expected_ports) - set(found_ports)
+    LOGGER.write(LogType.Info, f"concurrency {max_scan_concurrency()}, {DEFAULT_END_PORT - DEFAULT_START_PORT} ports")
+    LOGGER.write(LogType.Info, f"first open port after {(first_port_time or 0) * 1000:.1f} ms, full scan in {total_time * 1000:.1f} ms")
+    LOGGER.write(LogType.Info, f"found {len(found_ports)} open ports, {len(missing_ports)} of {len(expected_ports)} listeners missed")
+    for listener in listeners: listener.close()
@@ -1,10 +1,8 @@
 from dataclasses import dataclass
-from notifypy import Notify
-from ui import ICON_ICO_PATH
+from typing import Any
 
-global_notification = Notify(
-    default_notification_icon=str(ICON_ICO_PATH),
-)
+# `notifypy` is imported on the first notification
+global_notification: Any = None
 
 @dataclass
 class Notification:
@@ -16,6 +14,12 @@ def send_notification(notification: Notification | None):
     if notification is None: return
 
     from utils.i18n import get_i18n
+    if global_notification is None:
+        from notifypy import Notify
+        from ui import ICON_ICO_PATH
+        global_notification = Notify(
+            default_notification_icon=str(ICON_ICO_PATH),
+        )
     global_notification.application_name = get_i18n()(["InputShare", "输入流转"])
     global_notification.title = notification.title
     global_notification.message = notification.message
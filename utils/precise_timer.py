@@ -0,0 +1,87 @@
+import sys
+import time
+
+from typing import Any
+
+# before Python 3.11, `time.sleep` and the lock timeouts on Windows
+# are rounded up to the system timer tick
+IS_TIMER_COARSE = sys.platform == "win32" and sys.version_info < (3, 11)
+COARSE_TIMER_RESOLUTION_SEC = 0.0156
+# where the timer is coarse, the end of a wait is spun on `perf_counter`,
+# covering the overshoot of the sleep
+SPIN_DURATION_SEC = 0.0005
+
+class Win32HighResolutionTimer:
+    """
+    A waitable timer created with `CREATE_WAITABLE_TIMER_HIGH_RESOLUTION`,
+    available from Windows 10 1803 on, raises `OSError` when not available.
+    """
+    CREATE_WAITABLE_TIMER_HIGH_RESOLUTION = 0x00000002
+    TIMER_ALL_ACCESS = 0x001F0003
+    INFINITE = 0xFFFFFFFF
+
+    def __init__(self) -> None:
+        import ctypes
+        from ctypes import wintypes
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        def bind(name: str, argtypes: list, restype: Any) -> Any:
+            func = getattr(kernel32, name)
+            func.argtypes, func.restype = argtypes, restype
+            return func
+        create_timer = bind("CreateWaitableTimerExW",
+            [wintypes.LPVOID, wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD], wintypes.HANDLE)
+        self.__set_timer = bind("SetWaitableTimer",
+            [wintypes.HANDLE, ctypes.POINTER(ctypes.c_longlong), wintypes.LONG,
+             wintypes.LPVOID, wintypes.LPVOID, wintypes.BOOL], wintypes.BOOL)
+        self.__wait = bind("WaitForSingleObject", [wintypes.HANDLE, wintypes.DWORD], wintypes.DWORD)
+        self.__close_handle = bind("CloseHandle", [wintypes.HANDLE], wintypes.BOOL)
+        self.__ctypes = ctypes
+
+        self.__handle = create_timer(None, None,
+            Win32HighResolutionTimer.CREATE_WAITABLE_TIMER_HIGH_RESOLUTION,
+            Win32HighResolutionTimer.TIMER_ALL_ACCESS)
+        if not self.__handle:
+            raise OSError("CreateWaitableTimerExW failed, error " + str(ctypes.get_last_error()))
+
+    def sleep(self, duration_sec: float):
+        # a negative due time is relative, in 100 ns units
+        due_time = self.__ctypes.c_longlong(-int(duration_sec * 10_000_000))
+        if not self.__set_timer(self.__handle, self.__ctypes.byref(due_time), 0, None, None, False):
+            time.sleep(duration_sec); return
+        self.__wait(self.__handle, Win32HighResolutionTimer.INFINITE)
+
+    def close(self):
+        self.__close_handle(self.__handle)
+
+class PreciseSleeper:
+    """
+    Sleeps until a `perf_counter` deadline with sub-millisecond precision,
+    with `time.sleep` where it is precise, otherwise with a sleep on a high
+    resolution timer then a short spin. `is_precise` is False when the platform has no
+    such timer, the waits shorter than `COARSE_TIMER_RESOLUTION_SEC` should be skipped.
+    Each thread should own its sleeper.
+    """
+    def __init__(self) -> None:
+        self.__timer: Win32HighResolutionTimer | None = None
+        self.is_precise = not IS_TIMER_COARSE
+        if IS_TIMER_COARSE:
+            try:
+                self.__timer = Win32HighResolutionTimer()
+                self.is_precise = True
+            except OSError: pass
+
+    def sleep_until(self, deadline: float):
+        if not IS_TIMER_COARSE:
+            # precise enough already, spinning would hold the GIL and a core
+            remaining = deadline - time.perf_counter()
+            if remaining > 0: time.sleep(remaining)
+            return
+        remaining = deadline - time.perf_counter() - SPIN_DURATION_SEC
+        if remaining > 0:
+            if self.__timer is not None: self.__timer.sleep(remaining)
+            else: time.sleep(remaining)
+        while time.perf_counter() < deadline: pass
+
+    def close(self):
+        if self.__timer is not None: self.__timer.close()
@@ -0,0 +1,59 @@
+import builtins
+import sys
+import threading
+import time
+
+from utils.logger import LOGGER, LogType
+
+PROFILE_STARTUP_FLAG = "--profile-startup"
+
+class ImportProfiler:
+    """
+    Measures the first import of every module on the main thread,
+    by wrapping `builtins.__import__`. Only meant for `--profile-startup`.
+    """
+    REPORT_SIZE = 20
+
+    def __init__(self) -> None:
+        self.is_enabled = False
+        # module name -> (self time, inclusive time)
+        self.records: dict[str, tuple[float, float]] = {}
+        # the children time of the imports in progress
+        self.__children_time_stack: list[float] = []
+        self.__main_thread_id = threading.get_ident()
+
+    def start(self):
+        if self.is_enabled: return
+        self.is_enabled = True
+        original_import = builtins.__import__
+
+        def profiled_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if level != 0 or name in sys.modules or\
+               threading.get_ident() != self.__main_thread_id:
+                return original_import(name, globals, locals, fromlist, level)
+            self.__children_time_stack.append(0.0)
+            start_time = time.perf_counter()
+            try: return original_import(name, globals, locals, fromlist, level)
+            finally:
+                inclusive_time = time.perf_counter() - start_time
+                children_time = self.__children_time_stack.pop()
+                if len(self.__children_time_stack) > 0:
+                    self.__children_time_stack[-1] += inclusive_time
+                self.records[name] = (inclusive_time - children_time, inclusive_time)
+        builtins.__import__ = profiled_import
+
+    def summary(self) -> str:
+        records = sorted(self.records.items(), key=lambda item: item[1][0], reverse=True)
+        total_time = sum(self_time for _, (self_time, _) in records)
+        lines = [f"{len(records)} modules imported in {total_time * 1000:.0f} ms, slowest (self / inclusive):"]
+        for name, (self_time, inclusive_time) in records[:ImportProfiler.REPORT_SIZE]:
+            lines.append(f"  {self_time * 1000:8.1f} ms / {inclusive_time * 1000:8.1f} ms  {name}")
+        return "\n".join(lines)
+
+    def report(self, phase: str):
+        if not self.is_enabled: return
+        from utils.timeline import STARTUP_TIMELINE
+        LOGGER.write(LogType.Info, f"Startup profile at {phase}:\n" + self.summary())
+        STARTUP_TIMELINE.log()
+
+STARTUP_PROFILER = ImportProfiler()
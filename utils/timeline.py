@@ -0,0 +1,37 @@
+import threading
+import time
+
+from utils.logger import LOGGER, LogType
+
+class Timeline:
+    """
+    Records the moments of the startup relative to the process start,
+    and the durations of the steps that may run in parallel.
+    """
+    def __init__(self) -> None:
+        self.start_time = time.perf_counter()
+        self.__lock = threading.Lock()
+        self.__marks: list[tuple[str, float]] = []
+        self.__durations: list[tuple[str, float]] = []
+
+    def mark(self, label: str):
+        with self.__lock:
+            self.__marks.append((label, time.perf_counter() - self.start_time))
+
+    def record_duration(self, label: str, duration_sec: float):
+        with self.__lock: self.__durations.append((label, duration_sec))
+
+    def summary(self) -> str:
+        with self.__lock:
+            marks = ", ".join(f"{label} +{offset * 1000:.0f} ms" for label, offset in self.__marks)
+            durations = ", ".join(f"{label} {duration * 1000:.0f} ms" for label, duration in self.__durations)
+            total_duration = sum(duration for _, duration in self.__durations)
+        summary = marks
+        if len(durations) > 0:
+            summary += f"; steps: {durations} (sum {total_duration * 1000:.0f} ms)"
+        return summary
+
+    def log(self):
+        LOGGER.write(LogType.Info, "Startup timeline: " + self.summary())
+
+STARTUP_TIMELINE = Timeline()
@@ -0,0 +1,100 @@
+import atexit
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+from typing import Any, Callable, ContextManager, TypeVar
+from utils.logger import LOGGER, LogType, log_base_dir
+
+TRACE_FLAG = "--trace"
+DEFAULT_TRACE_FILE_NAME = "InputShare-trace.json"
+
+class Tracer:
+    """
+    Records spans as Chrome trace events (chrome://tracing, Perfetto),
+    written to `path` at exit. While disabled, `span` returns a shared
+    no-op context manager, so the instrumentation costs one attribute check.
+    """
+    MAX_EVENTS = 100_000
+
+    def __init__(self) -> None:
+        self.is_enabled = False
+        self.path: str | None = None
+        self.__lock = threading.Lock()
+        self.__events: list[dict[str, Any]] = []
+        # the threads may have exited when the trace is written
+        self.__thread_names: dict[int, str] = {}
+        self.__pid = os.getpid()
+        self.__start_time = time.perf_counter()
+
+    def enable(self, path: str):
+        self.path = path
+        self.is_enabled = True
+        atexit.register(self.save)
+
+    def __timestamp(self, perf_time: float) -> float:
+        # in microseconds
+        return (perf_time - self.__start_time) * 1_000_000
+
+    def __append(self, event: dict[str, Any]):
+        thread = threading.current_thread()
+        with self.__lock:
+            self.__thread_names.setdefault(event["tid"], thread.name)
+            if len(self.__events) < Tracer.MAX_EVENTS: self.__events.append(event)
+
+    @contextlib.contextmanager
+    def __span(self, name: str, args: dict[str, Any]):
+        start_time = time.perf_counter()
+        try: yield
+        finally:
+            end_time = time.perf_counter()
+            self.__append({
+                "name": name, "ph": "X", "pid": self.__pid, "tid": threading.get_ident(),
+                "ts": self.__timestamp(start_time), "dur": (end_time - start_time) * 1_000_000,
+                "args": args,
+            })
+
+    def span(self, name: str, **args: Any) -> ContextManager[None]:
+        if not self.is_enabled: return NULL_SPAN
+        return self.__span(name, args)
+
+    def instant(self, name: str, **args: Any):
+        if not self.is_enabled: return
+        self.__append({
+            "name": name, "ph": "i", "s": "p", "pid": self.__pid, "tid": threading.get_ident(),
+            "ts": self.__timestamp(time.perf_counter()), "args": args,
+        })
+
+    def save(self):
+        if self.path is None: return
+        with self.__lock:
+            events = list(self.__events)
+            thread_names = [{
+                "name": "thread_name", "ph": "M", "pid": self.__pid, "tid": tid,
+                "args": {"name": name},
+            } for tid, name in self.__thread_names.items()]
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": thread_names + events, "displayTimeUnit": "ms"}, f)
+            LOGGER.write(LogType.Info, f"Trace with {len(events)} events written to {self.path}")
+        except OSError as e:
+            LOGGER.write(LogType.Error, "Writing trace failed: " + str(e))
+
+NULL_SPAN = contextlib.nullcontext()
+TRACER = Tracer()
+
+def default_trace_path() -> str:
+    return os.path.join(log_base_dir, DEFAULT_TRACE_FILE_NAME)
+
+F = TypeVar("F", bound=Callable[..., Any])
+def traced(name: str) -> Callable[[F], F]:
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TRACER.is_enabled: return func(*args, **kwargs)
+            with TRACER.span(name): return func(*args, **kwargs)
+        return wrapper # type: ignore
+    return decorator